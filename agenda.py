@@ -0,0 +1,252 @@
+import time
+import threading
+from collections import namedtuple
+from datetime import datetime, timedelta
+
+from sqlalchemy import select, update
+from sqlalchemy.exc import IntegrityError
+
+from base import Citas, Veterinarios
+from consultas import insert_returning, delete_returning
+from auditoria import audit_writer, CREATE, UPDATE, DELETE
+from configuracion import get_setting
+from referencias import reference_cache
+
+# Duración por defecto de una cita, en minutos
+DEFAULT_DURATION = get_setting("CITA_DURACION", 30, int)
+
+# Horario de atención y tamaño de cada bloque de la agenda (minutos)
+WORKDAY_START = get_setting("AGENDA_INICIO", "09:00")
+WORKDAY_END = get_setting("AGENDA_FIN", "18:00")
+SLOT_MINUTES = get_setting("AGENDA_BLOQUE_MINUTOS", 15, int)
+
+# Segundos que se conserva la ocupación de un día antes de releerla (las citas
+# agendadas desde otros puestos se ven a más tardar después de este tiempo)
+AGENDA_CACHE_SECONDS = get_setting("AGENDA_CACHE_SEGUNDOS", 60, int)
+
+# Nombre de la restricción de exclusión de PostgreSQL y mensaje de los triggers de SQLite (ver esquema.py)
+OVERLAP_CONSTRAINT = 'citas_sin_solapamiento'
+
+class AppointmentConflictError(ValueError):
+    pass
+
+# Función para calcular el fin de una cita
+def appointment_end(fecha, hora, duracion):
+    return datetime.combine(fecha, hora) + timedelta(minutes=duracion)
+
+# Función para buscar una cita del mismo veterinario que se cruce con el horario
+# pedido. Usa el índice (veterinarioid, fecha): lee la agenda de ese día y de los
+# vecinos (una cita del día anterior o la pedida pueden pasar la medianoche).
+def find_conflict(db, veterinarioid, fecha, hora, duracion, exclude_citaid=None):
+    start = datetime.combine(fecha, hora)
+    end = start + timedelta(minutes=duracion)
+    stmt = select(Citas.citaid, Citas.fecha, Citas.hora, Citas.duracion).where(
+        Citas.veterinarioid == veterinarioid,
+        Citas.fecha.between(fecha - timedelta(days=1), end.date()),
+    ).order_by(Citas.fecha, Citas.hora)
+    if exclude_citaid is not None:
+        stmt = stmt.where(Citas.citaid != exclude_citaid)
+    for cita in db.execute(stmt):
+        cita_start = datetime.combine(cita.fecha, cita.hora)
+        if cita_start < end and appointment_end(cita.fecha, cita.hora, cita.duracion) > start:
+            return cita
+    return None
+
+def _conflict_error(cita):
+    return AppointmentConflictError(
+        f"El veterinario ya tiene la cita {cita.citaid} el {cita.fecha} a las {cita.hora.strftime('%H:%M')} "
+        f"({cita.duracion} min)"
+    )
+
+def _is_overlap_violation(error):
+    return OVERLAP_CONSTRAINT in str(error.orig)
+
+# Bases donde el propio motor rechaza el cruce: restricción de exclusión en
+# PostgreSQL y triggers en SQLite (ver esquema.py)
+OVERLAP_CHECKED_BY_DATABASE = ('postgresql', 'sqlite')
+
+# Función para guardar una cita (write() hace el INSERT o UPDATE y devuelve la fila)
+# sin solapamientos para el veterinario. La base rechaza el cruce de forma atómica
+# en la misma sentencia de escritura, aun con varios hilos o puestos agendando a la
+# vez, y solo se consulta la cita en conflicto para el mensaje de error. En otras
+# bases se revisa la agenda con el índice antes de escribir.
+def _save_without_overlap(db, values, write, citaid=None):
+    if db.get_bind().dialect.name not in OVERLAP_CHECKED_BY_DATABASE:
+        conflict = find_conflict(db, values['veterinarioid'], values['fecha'], values['hora'], values['duracion'], citaid)
+        if conflict is not None:
+            db.rollback()
+            raise _conflict_error(conflict)
+        return write()
+    try:
+        return write()
+    except IntegrityError as e:
+        db.rollback()
+        if not _is_overlap_violation(e):
+            raise
+        conflict = find_conflict(db, values['veterinarioid'], values['fecha'], values['hora'], values['duracion'], citaid)
+        if conflict is None:
+            raise
+        raise _conflict_error(conflict) from None
+
+# Función para registrar una cita nueva
+def insert_appointment(db, values):
+    values = dict(values)
+    values.setdefault('duracion', DEFAULT_DURATION)
+    row = _save_without_overlap(db, values, lambda: insert_returning(db, Citas, values))
+    agenda_cache.invalidate(row.fecha)
+    audit_writer.record(CREATE, row)
+    return row
+
+# Función para modificar una cita (values puede traer solo las columnas que cambian)
+def update_appointment(db, citaid, values):
+    current = db.execute(select(*Citas.__table__.columns).where(Citas.citaid == citaid)).first()
+    if current is None:
+        raise ValueError(f"La cita {citaid} no existe")
+    merged = dict(current._mapping, **values)
+
+    def write():
+        stmt = update(Citas).where(Citas.citaid == citaid).values(**values).returning(*Citas.__table__.columns)
+        row = db.execute(stmt).one()
+        db.commit()
+        return row
+
+    row = _save_without_overlap(db, merged, write, citaid)
+    agenda_cache.invalidate(current.fecha)
+    agenda_cache.invalidate(row.fecha)
+    audit_writer.record(UPDATE, row)
+    return row
+
+# Función para borrar varias citas en una sola sentencia. Devuelve los citaid borrados.
+def delete_appointments(db, citaids):
+    rows = delete_returning(db, Citas, citaids, Citas.__table__.columns)
+    for row in rows:
+        agenda_cache.invalidate(row.fecha)
+        audit_writer.record(DELETE, row)
+    return [row.citaid for row in rows]
+
+# Horario libre encontrado por find_slots
+Slot = namedtuple('Slot', 'fecha hora veterinarioid')
+
+def _minutes(hhmm):
+    hours, minutes = hhmm.split(':')
+    return int(hours) * 60 + int(minutes)
+
+# Ocupación de la agenda por día: para cada veterinario un entero donde el bit i
+# indica que el bloque i del horario de atención está ocupado. Un día se lee con
+# una sola consulta (índice veterinarioid, fecha) y queda en memoria hasta que se
+# agenda o borra una cita de ese día, o hasta que vence AGENDA_CACHE_SECONDS.
+class AgendaCache:
+    def __init__(self, start=WORKDAY_START, end=WORKDAY_END, slot_minutes=SLOT_MINUTES, ttl=AGENDA_CACHE_SECONDS):
+        self.start = _minutes(start)
+        self.slot_minutes = slot_minutes
+        self.slots = (_minutes(end) - self.start) // slot_minutes
+        self.ttl = ttl
+        self._days = {}
+        self._lock = threading.Lock()
+
+    # Devuelve {fecha: {veterinarioid: bitmap}} para las fechas pedidas; los días
+    # que faltan en memoria se cargan juntos en una sola consulta. "vets" son todos
+    # los veterinarios, así la consulta usa el índice (veterinarioid, fecha).
+    def occupancy(self, db, fechas, vets):
+        now = time.monotonic()
+        with self._lock:
+            result = {}
+            missing = []
+            for fecha in fechas:
+                entry = self._days.get(fecha)
+                if entry is not None and now - entry[0] < self.ttl:
+                    result[fecha] = entry[1]
+                else:
+                    missing.append(fecha)
+        if missing:
+            loaded = {fecha: {} for fecha in missing}
+            stmt = select(Citas.fecha, Citas.hora, Citas.duracion, Citas.veterinarioid).where(
+                Citas.veterinarioid.in_(vets), Citas.fecha.between(min(missing), max(missing)))
+            for cita in db.execute(stmt):
+                day = loaded.get(cita.fecha)
+                if day is not None:
+                    day[cita.veterinarioid] = day.get(cita.veterinarioid, 0) | self._mask(cita.hora, cita.duracion)
+            with self._lock:
+                for fecha, day in loaded.items():
+                    self._days[fecha] = (now, day)
+            result.update(loaded)
+        return result
+
+    # Bits de los bloques que ocupa una cita (recortados al horario de atención)
+    def _mask(self, hora, duracion):
+        begin = hora.hour * 60 + hora.minute - self.start
+        end = begin + duracion
+        first = max(begin // self.slot_minutes, 0)
+        last = min(-(-end // self.slot_minutes), self.slots)
+        if last <= first:
+            return 0
+        return ((1 << (last - first)) - 1) << first
+
+    def slot_time(self, index):
+        minutes = self.start + index * self.slot_minutes
+        return datetime.min.replace(hour=minutes // 60, minute=minutes % 60).time()
+
+    def invalidate(self, fecha=None):
+        with self._lock:
+            if fecha is None:
+                self._days.clear()
+            else:
+                self._days.pop(fecha, None)
+
+agenda_cache = AgendaCache()
+
+# Bits de inicio de los tramos libres de "blocks" bloques seguidos: se desplaza
+# la máscara de bloques libres y se intersecta, sin recorrer bloque por bloque
+def _free_starts(occupied, blocks, slots):
+    free = ~occupied & ((1 << slots) - 1)
+    starts = free
+    for shift in range(1, blocks):
+        starts &= free >> shift
+    return starts
+
+# Función para buscar los primeros horarios libres entre dos fechas (inclusive),
+# opcionalmente solo para veterinarios de una especialidad. Devuelve hasta
+# "limit" Slot ordenados por fecha, hora y veterinario. Los días pasados no
+# tienen horarios libres: el rango empieza como mínimo hoy, antes de leer la
+# ocupación, y si termina antes de hoy no hay nada que buscar.
+def find_slots(db, desde, hasta, duracion=DEFAULT_DURATION, especialidad=None, limit=10, cache=agenda_cache):
+    now = datetime.now()
+    desde = max(desde, now.date())
+    if desde > hasta:
+        return []
+    reference_cache.refresh(db)
+    all_vets = reference_cache.rows(Veterinarios)
+    wanted = especialidad.strip().lower() if especialidad else None
+    vets = [vet.veterinarioid for vet in all_vets
+            if wanted is None or (vet.especialidad or '').strip().lower() == wanted]
+    if not vets:
+        return []
+    blocks = -(-duracion // cache.slot_minutes)
+    if blocks > cache.slots:
+        return []
+    fechas = [desde + timedelta(days=offset) for offset in range((hasta - desde).days + 1)]
+    occupancy = cache.occupancy(db, fechas, [vet.veterinarioid for vet in all_vets])
+    slots = []
+    for fecha in fechas:
+        # Hoy solo cuentan los bloques que todavía no empezaron
+        past = 0
+        if fecha == now.date():
+            elapsed = now.hour * 60 + now.minute - cache.start
+            past = (1 << min(max(-(-elapsed // cache.slot_minutes), 0), cache.slots)) - 1
+        day = occupancy[fecha]
+        candidates = []
+        for veterinarioid in vets:
+            starts = _free_starts(day.get(veterinarioid, 0) | past, blocks, cache.slots)
+            # Basta con los primeros "limit" inicios de cada veterinario
+            for _ in range(limit):
+                if not starts:
+                    break
+                low = starts & -starts
+                candidates.append((low.bit_length() - 1, veterinarioid))
+                starts ^= low
+        candidates.sort()
+        for index, veterinarioid in candidates:
+            slots.append(Slot(fecha, cache.slot_time(index), veterinarioid))
+            if len(slots) == limit:
+                return slots
+    return slots
@@ -0,0 +1,172 @@
+import sys
+import queue
+import atexit
+import threading
+import time
+from datetime import datetime
+
+from sqlalchemy import insert
+
+from base import engine, AuditoriaCitas
+from configuracion import get_setting
+
+# Eventos por INSERT y espera máxima antes de escribir un lote incompleto
+AUDIT_BATCH_SIZE = get_setting("AUDIT_BATCH_SIZE", 100, int)
+AUDIT_FLUSH_MS = get_setting("AUDIT_FLUSH_MS", 500, int)
+
+# Si un lote no se puede escribir se conserva y se reintenta: la espera empieza
+# en AUDIT_RETRY_MS y se duplica en cada fallo hasta AUDIT_RETRY_MAX_MS. Al cerrar
+# se hacen hasta AUDIT_SHUTDOWN_RETRIES intentos más con lo que haya quedado.
+AUDIT_RETRY_MS = get_setting("AUDIT_RETRY_MS", 500, int)
+AUDIT_RETRY_MAX_MS = get_setting("AUDIT_RETRY_MAX_MS", 30000, int)
+AUDIT_SHUTDOWN_RETRIES = get_setting("AUDIT_SHUTDOWN_RETRIES", 3, int)
+
+# Acciones que se registran
+CREATE = 'alta'
+UPDATE = 'cambio'
+DELETE = 'baja'
+
+_STOP = object()
+
+# Escritor en segundo plano para auditoriacitas. record() solo encola el evento
+# (no toca la base), así la auditoría no agrega demora a agendar una cita. Un hilo
+# junta los eventos y los escribe con un INSERT de varias filas cada
+# AUDIT_BATCH_SIZE eventos o cada AUDIT_FLUSH_MS milisegundos, lo que ocurra
+# primero. Un lote que falla no se descarta: se reintenta con espera creciente
+# junto con los eventos que sigan llegando. shutdown() detiene el hilo y escribe
+# en el hilo que llama todo lo que haya quedado pendiente.
+class AuditWriter:
+    def __init__(self, bind=None, batch_size=AUDIT_BATCH_SIZE, flush_ms=AUDIT_FLUSH_MS,
+                 retry_ms=AUDIT_RETRY_MS, retry_max_ms=AUDIT_RETRY_MAX_MS, shutdown_retries=AUDIT_SHUTDOWN_RETRIES):
+        self.bind = bind or engine
+        self.batch_size = batch_size
+        self.flush_interval = flush_ms / 1000
+        self.retry_interval = retry_ms / 1000
+        self.retry_max = retry_max_ms / 1000
+        self.shutdown_retries = shutdown_retries
+        self._queue = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+        self._closed = False
+        # Eventos que el hilo no pudo escribir antes de detenerse
+        self._unwritten = []
+        self.written = 0
+        self.retries = 0
+        self.failed = 0
+
+    # Encolar un evento para la cita "cita" (fila o objeto con las columnas de citas).
+    # La fecha de registro es la del evento, no la de la escritura del lote.
+    def record(self, accion, cita):
+        event = dict(
+            accion=accion,
+            citaid=cita.citaid,
+            fecha=cita.fecha,
+            hora=cita.hora,
+            mascotaid=cita.mascotaid,
+            veterinarioid=cita.veterinarioid,
+            descripcion=cita.descripcion,
+            fecharegistro=datetime.now(),
+        )
+        with self._lock:
+            closed = self._closed
+            if not closed:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._run, name='auditoria', daemon=True)
+                    self._thread.start()
+                # Dentro del lock, para que no quede detrás de la marca de fin
+                self._queue.put(event)
+        if closed:
+            # Ya no hay hilo: se escribe directamente
+            self._write_or_drop([event])
+
+    def _run(self):
+        batch = []
+        deadline = None
+        retry_at = None
+        attempts = 0
+        while True:
+            wait_until = retry_at if retry_at is not None else deadline
+            timeout = None if wait_until is None else max(wait_until - time.monotonic(), 0)
+            try:
+                event = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                event = None
+            if event is _STOP:
+                # Un último intento; si falla, shutdown() sigue con lo que quedó
+                if batch and not self._write(batch):
+                    with self._lock:
+                        self._unwritten.extend(batch)
+                return
+            if event is not None:
+                if not batch:
+                    deadline = time.monotonic() + self.flush_interval
+                batch.append(event)
+            now = time.monotonic()
+            if retry_at is not None:
+                if now < retry_at:
+                    continue
+            elif not batch or (len(batch) < self.batch_size and now < deadline):
+                continue
+            if self._write(batch):
+                batch = []
+                deadline = retry_at = None
+                attempts = 0
+            else:
+                attempts += 1
+                self.retries += 1
+                retry_at = now + min(self.retry_interval * 2 ** (attempts - 1), self.retry_max)
+
+    # INSERT ... VALUES (...), (...), ... de a batch_size filas, todo en una
+    # transacción. Devuelve False (sin lanzar) si no se pudo escribir.
+    def _write(self, batch):
+        if not batch:
+            return True
+        try:
+            with self.bind.begin() as conn:
+                for start in range(0, len(batch), self.batch_size):
+                    conn.execute(insert(AuditoriaCitas).values(batch[start:start + self.batch_size]))
+        except Exception as e:
+            print(f"No se pudieron registrar {len(batch)} eventos de auditoría (se reintentará): {e}", file=sys.stderr)
+            return False
+        self.written += len(batch)
+        return True
+
+    # Escribir con los reintentos del cierre; lo que no entra se informa como perdido
+    def _write_or_drop(self, batch):
+        for attempt in range(self.shutdown_retries + 1):
+            if attempt:
+                time.sleep(min(self.retry_interval * 2 ** (attempt - 1), self.retry_max))
+            if self._write(batch):
+                return
+        self.failed += len(batch)
+        print(f"Se perdieron {len(batch)} eventos de auditoría", file=sys.stderr)
+
+    # Detener el hilo y escribir aquí los eventos pendientes. El hilo no queda
+    # abandonado: la marca de fin interrumpe la espera entre reintentos.
+    def shutdown(self):
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            thread = self._thread
+        if thread is not None:
+            self._queue.put(_STOP)
+            thread.join()
+        remaining = []
+        while True:
+            try:
+                event = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if event is not _STOP:
+                remaining.append(event)
+        with self._lock:
+            remaining = self._unwritten + remaining
+            self._unwritten = []
+        if remaining:
+            self._write_or_drop(remaining)
+
+audit_writer = AuditWriter()
+
+# Por si la aplicación termina sin llamar a shutdown()
+atexit.register(audit_writer.shutdown)
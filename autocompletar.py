@@ -0,0 +1,121 @@
+import bisect
+import unicodedata
+from array import array
+
+from sqlalchemy import select
+
+from base import Clientes, Mascotas
+from consultas import stream_rows
+from configuracion import get_setting
+
+# Límite de palabras indexadas en memoria; si la clínica tiene más, el índice
+# queda incompleto y las pantallas siguen usando la búsqueda del servidor
+TYPEAHEAD_MAX_ENTRIES = get_setting("TYPEAHEAD_MAX_ENTRIES", 300000, int)
+TYPEAHEAD_ENABLED = get_setting("TYPEAHEAD_ENABLED", True, bool)
+
+# Función para normalizar texto: minúsculas y sin tildes ("Ñandú" -> "nandu")
+def normalize(value):
+    value = unicodedata.normalize('NFKD', value or '')
+    return ''.join(char for char in value if not unicodedata.combining(char)).lower()
+
+# Índice de prefijos en memoria para autocompletar nombres. Guarda cada palabra
+# normalizada en una lista ordenada (con los ids en un array paralelo) y busca
+# con bisect, sin ir a la base de datos. Se usa solo desde el hilo de Tk; la
+# carga inicial arma un índice nuevo en el hilo de fondo y luego se reemplaza.
+class PrefixIndex:
+    def __init__(self, max_entries=TYPEAHEAD_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self.complete = True
+        self._words = []
+        self._ids = array('q')
+        # id -> (etiqueta, palabras indexadas)
+        self._entries = {}
+
+    def __len__(self):
+        return len(self._words)
+
+    # Carga masiva: agrega todo sin ordenar y ordena una sola vez al final
+    def build(self, entries):
+        pairs = []
+        for key, label, *texts in entries:
+            words = self._split(texts)
+            if len(pairs) + len(words) > self.max_entries:
+                self.complete = False
+                break
+            self._entries[key] = (label, words)
+            pairs.extend((word, key) for word in words)
+        pairs.sort()
+        self._words = [word for word, _ in pairs]
+        self._ids = array('q', (key for _, key in pairs))
+        return self
+
+    def add(self, key, label, *texts):
+        self.remove(key)
+        words = self._split(texts)
+        if len(self._words) + len(words) > self.max_entries:
+            self.complete = False
+            return
+        self._entries[key] = (label, words)
+        for word in words:
+            position = bisect.bisect_right(self._words, word)
+            self._words.insert(position, word)
+            self._ids.insert(position, key)
+
+    def remove(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        for word in entry[1]:
+            start = bisect.bisect_left(self._words, word)
+            end = bisect.bisect_right(self._words, word, start)
+            for position in range(start, end):
+                if self._ids[position] == key:
+                    del self._words[position]
+                    del self._ids[position]
+                    break
+
+    # Devuelve hasta "limit" pares (id, etiqueta) cuyas palabras empiezan con el texto
+    def search(self, text, limit=10):
+        prefixes = normalize(text).split()
+        if not prefixes:
+            return []
+        # Se busca por la palabra más larga y se filtra por el resto
+        prefixes.sort(key=len, reverse=True)
+        first, others = prefixes[0], prefixes[1:]
+        results = []
+        seen = set()
+        position = bisect.bisect_left(self._words, first)
+        while position < len(self._words) and self._words[position].startswith(first):
+            key = self._ids[position]
+            position += 1
+            if key in seen:
+                continue
+            seen.add(key)
+            label, words = self._entries[key]
+            if others and not all(any(word.startswith(prefix) for word in words) for prefix in others):
+                continue
+            results.append((key, label))
+            if len(results) >= limit:
+                break
+        return results
+
+    def _split(self, texts):
+        return tuple(sorted({word for text in texts for word in normalize(text).split()}))
+
+# Función para armar el índice de clientes leyendo la tabla por lotes
+def build_client_index(max_entries=TYPEAHEAD_MAX_ENTRIES):
+    stmt = select(Clientes.clienteid, Clientes.nombre, Clientes.apellido)
+    rows = ((row.clienteid, client_label(row), row.nombre, row.apellido) for row in stream_rows(stmt))
+    return PrefixIndex(max_entries).build(rows)
+
+# Función para armar el índice de mascotas leyendo la tabla por lotes
+def build_pet_index(max_entries=TYPEAHEAD_MAX_ENTRIES):
+    stmt = select(Mascotas.mascotaid, Mascotas.nombre, Mascotas.especie)
+    rows = ((row.mascotaid, pet_label(row), row.nombre) for row in stream_rows(stmt))
+    return PrefixIndex(max_entries).build(rows)
+
+def client_label(client):
+    return f"{client.nombre or ''} {client.apellido or ''}".strip()
+
+def pet_label(pet):
+    return f"{pet.nombre or ''} ({pet.especie})" if pet.especie else (pet.nombre or '')
@@ -0,0 +1,228 @@
+import json
+import time
+import random
+import argparse
+import platform
+import tracemalloc
+from datetime import date, timedelta, datetime
+
+from sqlalchemy import select, func
+
+from base import Clientes, Mascotas, Citas, Veterinarios, Productos
+from agenda import agenda_cache
+from auditoria import audit_writer
+from instrumentacion import sql_stats
+from servicio import VeterinariaService, ClientInput, PetInput, AppointmentInput, SaleItem, SaleInput
+from datos_sinteticos import (SCALES, START_DATE, UPCOMING_DAYS, FIRST_NAMES, LAST_NAMES, PET_NAMES, parse_scale,
+                              default_url, bench_engine, prepare)
+
+# Mide las operaciones de la aplicación (cargar listas, agregar, borrar, buscar)
+# sobre una base con datos sintéticos (datos_sinteticos.py) y muestra operaciones
+# por segundo, latencia p50/p99 y memoria máxima de cada una.
+#
+#   python benchmark.py --escala 100k                          (SQLite temporal)
+#   python benchmark.py --url postgresql://... --escala 1m --json resultados.json
+#
+# Cada operación llama al mismo método de VeterinariaService que usa la ventana
+# en su hilo de fondo, con una conexión o sesión nueva del pool por llamada.
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(int(len(ordered) * fraction), len(ordered) - 1)]
+
+# Estado compartido por las operaciones (ids de la base y filas creadas por las altas)
+class BenchContext:
+    def __init__(self, bind, seed):
+        self.bind = bind
+        self.service = VeterinariaService(bind)
+        self.rng = random.Random(seed)
+        self.run = datetime.now().strftime('%Y%m%d%H%M%S')
+        with bind.connect() as conn:
+            self.clients = conn.execute(select(func.min(Clientes.clienteid), func.max(Clientes.clienteid))).one()
+            self.pets = conn.execute(select(func.min(Mascotas.mascotaid), func.max(Mascotas.mascotaid))).one()
+            self.vets = conn.execute(select(Veterinarios.veterinarioid).order_by(Veterinarios.veterinarioid)).scalars().all()
+            self.products = conn.execute(select(Productos.productoid).order_by(Productos.productoid)).scalars().all()
+            last_date = conn.execute(select(func.max(Citas.fecha))).scalar() or START_DATE
+        # Las citas nuevas van después de la agenda generada, en bloques libres
+        self.next_date = last_date + timedelta(days=1)
+        self.next_slot = 0
+        self.created = {'clientes': [], 'mascotas': [], 'citas': []}
+        self.counter = 0
+        self.slot_searches = [0, 0]
+
+    def client_id(self):
+        return self.rng.randint(*self.clients)
+
+    def pet_id(self):
+        return self.rng.randint(*self.pets)
+
+    def term(self):
+        return self.rng.choice(FIRST_NAMES + LAST_NAMES)[:4]
+
+    def unique(self):
+        self.counter += 1
+        return f"{self.run}-{self.counter}"
+
+def refresh_clients(ctx):
+    ctx.service.list_clients()
+
+def refresh_pets(ctx):
+    ctx.service.list_pets()
+
+def refresh_appointments(ctx):
+    ctx.service.list_appointments()
+
+def refresh_sales(ctx):
+    ctx.service.list_sales()
+
+def search_clients(ctx):
+    ctx.service.search_clients(ctx.term())
+
+def search_pets(ctx):
+    ctx.service.search_pets(ctx.rng.choice(PET_NAMES)[:3])
+
+def pet_history_page(ctx):
+    ctx.service.pet_history(ctx.pet_id())
+
+# Desde un día de la agenda próxima que llena prepare(); la ocupación en memoria se
+# descarta en cada llamada para medir la consulta y los bitmaps, no la caché
+def free_slots(ctx):
+    agenda_cache.invalidate()
+    slots = ctx.service.find_slots(date.today() + timedelta(days=1 + ctx.rng.randrange(UPCOMING_DAYS)))
+    ctx.slot_searches[0] += 1
+    ctx.slot_searches[1] += bool(slots)
+
+def add_client(ctx):
+    key = ctx.unique()
+    row = ctx.service.add_client(ClientInput(nombre="Bench", apellido=key, email=f"bench-{key}@sintetico.test"))
+    ctx.created['clientes'].append(row.clienteid)
+
+def add_pet(ctx):
+    row = ctx.service.add_pet(PetInput(nombre="Bench", especie="Perro", clienteid=ctx.client_id()))
+    ctx.created['mascotas'].append(row.mascotaid)
+
+def add_appointment(ctx):
+    day, vet = divmod(ctx.next_slot, len(ctx.vets))
+    ctx.next_slot += 1
+    cita = ctx.service.add_appointment(AppointmentInput(fecha=ctx.next_date + timedelta(days=day), hora=datetime.min.time().replace(hour=10),
+                                                        mascotaid=ctx.pet_id(), veterinarioid=ctx.vets[vet], duracion=30))
+    ctx.created['citas'].append(cita.citaid)
+
+def add_sale(ctx):
+    items = tuple(SaleItem(productoid, ctx.rng.randint(1, 3)) for productoid in ctx.rng.sample(ctx.products, 2))
+    ctx.service.checkout(SaleInput(ctx.client_id(), items))
+
+def delete_client(ctx):
+    if ctx.created['clientes']:
+        ctx.service.delete_clients([ctx.created['clientes'].pop()])
+
+def delete_pet(ctx):
+    if ctx.created['mascotas']:
+        ctx.service.delete_pets([ctx.created['mascotas'].pop()])
+
+def delete_appointment(ctx):
+    if ctx.created['citas']:
+        ctx.service.delete_appointments([ctx.created['citas'].pop()])
+
+# (nombre, función). Las bajas borran lo que crearon las altas, por eso van después.
+OPERATIONS = [
+    ("cargar clientes", refresh_clients),
+    ("cargar mascotas", refresh_pets),
+    ("cargar citas", refresh_appointments),
+    ("cargar ventas", refresh_sales),
+    ("buscar clientes", search_clients),
+    ("buscar mascotas", search_pets),
+    ("historial de mascota", pet_history_page),
+    ("horarios libres (30 días)", free_slots),
+    ("agregar cliente", add_client),
+    ("agregar mascota", add_pet),
+    ("agregar cita", add_appointment),
+    ("cobrar venta", add_sale),
+    ("eliminar cliente", delete_client),
+    ("eliminar mascota", delete_pet),
+    ("eliminar cita", delete_appointment),
+]
+
+# Función para medir una operación: primero las latencias (sin tracemalloc, que la
+# haría más lenta) y luego la memoria máxima en una segunda pasada más corta
+def measure(ctx, name, operation, iterations, memory_iterations):
+    latencies = []
+    started = time.perf_counter()
+    for _ in range(iterations):
+        begin = time.perf_counter()
+        with sql_stats.action(name):
+            operation(ctx)
+        latencies.append(time.perf_counter() - begin)
+    elapsed = time.perf_counter() - started
+    tracemalloc.start()
+    for _ in range(memory_iterations):
+        operation(ctx)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {
+        'operacion': name,
+        'iteraciones': iterations,
+        'ops_por_segundo': iterations / elapsed,
+        'p50_ms': percentile(latencies, 0.50) * 1000,
+        'p99_ms': percentile(latencies, 0.99) * 1000,
+        'pico_mib': peak / 1024 / 1024,
+    }
+
+# Con sql=True también se cuentan las sentencias de cada operación (instrumentacion.py)
+def run(bind, iterations, seed=42, only=None, sql=False):
+    ctx = BenchContext(bind, seed)
+    if sql:
+        sql_stats.attach(bind)
+        sql_stats.reset()
+    # La auditoría de las citas se escribe en la base del benchmark
+    audit_writer.bind = bind
+    memory_iterations = max(iterations // 10, 1)
+    results = []
+    print(f"{'operación':<28} {'n':>6} {'ops/s':>10} {'p50 ms':>9} {'p99 ms':>9} {'pico MiB':>9}")
+    for name, operation in OPERATIONS:
+        if only and not any(word in name for word in only):
+            continue
+        result = measure(ctx, name, operation, iterations, memory_iterations)
+        results.append(result)
+        print(f"{name:<28} {result['iteraciones']:>6} {result['ops_por_segundo']:>10,.1f} "
+              f"{result['p50_ms']:>9.2f} {result['p99_ms']:>9.2f} {result['pico_mib']:>9.2f}")
+    audit_writer.shutdown()
+    searches, found = ctx.slot_searches
+    if searches and not found:
+        raise RuntimeError("La búsqueda de horarios libres no devolvió ningún horario: la medición no es válida")
+    if sql:
+        sql_stats.detach(bind)
+        per_operation = {item['accion']: item for item in sql_stats.actions()}
+        print(f"\n{'operación':<28} {'sentencias/op':>14} {'máx':>5} {'ms en la base':>14}")
+        for result in results:
+            item = per_operation.get(result['operacion'])
+            if item is not None:
+                result['sentencias_por_op'] = item['sentencias_por_vez']
+                print(f"{result['operacion']:<28} {item['sentencias_por_vez']:>14.1f} {item['max_sentencias']:>5} {item['ms_base_por_vez']:>14.2f}")
+    return results
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark de las operaciones de la aplicación")
+    parser.add_argument("--url", help="Base de datos a usar (por defecto un SQLite temporal por escala)")
+    parser.add_argument("--escala", default="10k", help=f"Cantidad de citas: {', '.join(SCALES)} o un número")
+    parser.add_argument("--iteraciones", type=int, default=200)
+    parser.add_argument("--semilla", type=int, default=42)
+    parser.add_argument("--solo", nargs="*", help="Medir solo las operaciones que contienen estas palabras")
+    parser.add_argument("--json", help="Guardar los resultados en este archivo")
+    parser.add_argument("--sql", action="store_true", help="Contar las sentencias SQL de cada operación")
+    args = parser.parse_args()
+
+    bind = bench_engine(args.url or default_url(args.escala))
+    prepare(bind, parse_scale(args.escala), args.semilla)
+    results = run(bind, args.iteraciones, args.semilla, args.solo, args.sql)
+    if args.json:
+        report = {
+            'fecha': datetime.now().isoformat(timespec='seconds'),
+            'escala': args.escala,
+            'base': bind.dialect.name,
+            'python': platform.python_version(),
+            'resultados': results,
+        }
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+        print(f"Resultados guardados en {args.json}")
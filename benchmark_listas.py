@@ -0,0 +1,79 @@
+import os
+import time
+import argparse
+import tempfile
+import tracemalloc
+
+from sqlalchemy import create_engine, insert, select
+from sqlalchemy.orm import Session
+
+from base import Base, Clientes, engine_options, enforce_foreign_keys
+from consultas import LIST_COLUMNS
+
+# Compara la lectura de la lista de clientes con objetos ORM (db.query(X).all())
+# contra la lectura proyectada de consultas.fetch_rows (solo columnas, sin ORM).
+#
+#   python benchmark_listas.py                      (SQLite temporal con 100k clientes)
+#   python benchmark_listas.py --url postgresql://... --rows 200000
+
+# Función para cargar clientes de prueba si la tabla tiene menos de "rows" filas
+def seed_clients(bench_engine, rows, batch_size=10000):
+    Base.metadata.create_all(bind=bench_engine, tables=[Clientes.__table__])
+    with bench_engine.begin() as conn:
+        existing = conn.execute(select(Clientes.clienteid).order_by(Clientes.clienteid.desc()).limit(1)).scalar() or 0
+        for start in range(existing, rows, batch_size):
+            batch = [
+                {'nombre': f"Nombre{i}", 'apellido': f"Apellido{i}", 'direccion': f"Calle {i}",
+                 'telefono': f"09{i:08d}", 'email': f"bench{i}@veterinaria.test"}
+                for i in range(start, min(start + batch_size, rows))
+            ]
+            conn.execute(insert(Clientes), batch)
+
+# Función para medir una lectura completa: primero el tiempo (sin tracemalloc,
+# que la haría más lenta) y luego la memoria máxima en una segunda pasada
+def measure(label, read):
+    started = time.perf_counter()
+    count = read()
+    elapsed = time.perf_counter() - started
+    tracemalloc.start()
+    read()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"{label:<28} {count:>9} filas  {elapsed:8.3f} s  {count / elapsed:>12,.0f} filas/s  pico {peak / 1024 / 1024:8.1f} MiB")
+    return elapsed, peak
+
+def read_orm(bench_engine):
+    with Session(bench_engine) as db:
+        clients = db.query(Clientes).all()
+        values = [(c.nombre, c.apellido, c.direccion, c.telefono, c.email) for c in clients]
+    return len(values)
+
+def read_projected(bench_engine):
+    with bench_engine.connect() as conn:
+        rows = conn.execute(select(*LIST_COLUMNS[Clientes])).all()
+        values = [(r.nombre, r.apellido, r.direccion, r.telefono, r.email) for r in rows]
+    return len(values)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark de lectura de listas")
+    parser.add_argument("--url", help="Base de datos a usar (por defecto un SQLite temporal)")
+    parser.add_argument("--rows", type=int, default=100000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    url = args.url or "sqlite:///" + os.path.join(tempfile.gettempdir(), "veterinaria_bench.db")
+    options = engine_options(url)
+    options["echo"] = False
+    bench_engine = enforce_foreign_keys(create_engine(url, **options))
+    seed_clients(bench_engine, args.rows)
+
+    results = {}
+    for _ in range(args.repeat):
+        results.setdefault("orm", []).append(measure("db.query(Clientes).all()", lambda: read_orm(bench_engine)))
+        results.setdefault("rows", []).append(measure("fetch_rows (proyección)", lambda: read_projected(bench_engine)))
+
+    orm_time = min(r[0] for r in results["orm"])
+    rows_time = min(r[0] for r in results["rows"])
+    orm_peak = min(r[1] for r in results["orm"])
+    rows_peak = min(r[1] for r in results["rows"])
+    print(f"\nProyección: {orm_time / rows_time:.1f}x más rápida, {orm_peak / max(rows_peak, 1):.1f}x menos memoria")
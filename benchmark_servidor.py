@@ -0,0 +1,132 @@
+import os
+import json
+import time
+import random
+import asyncio
+import argparse
+import platform
+from datetime import datetime
+
+try:
+    import aiohttp
+except ImportError:
+    aiohttp = None
+
+# Prueba de carga de las lecturas del servidor HTTP (servidor.py). Cada ruta se
+# mide por separado durante unos segundos con varias peticiones en paralelo y
+# se muestran peticiones por segundo y latencia p50/p99.
+#
+#   python servidor.py --puerto 8080 &
+#   python benchmark_servidor.py --servidor http://127.0.0.1:8080 --pid $!
+#
+# Con --pid también se lee el tiempo de CPU que usó el proceso del servidor
+# (/proc, Linux) y se informa "pet/s por núcleo": peticiones atendidas por
+# segundo de CPU del servidor. Es la capacidad de un núcleo aunque este
+# programa corra en la misma máquina y le quite CPU al servidor.
+
+BENCH_SECONDS = 10
+BENCH_CONCURRENCY = 32
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(int(len(ordered) * fraction), len(ordered) - 1)]
+
+# Segundos de CPU (usuario + sistema) del proceso, desde /proc/<pid>/stat
+def process_cpu_seconds(pid):
+    with open(f"/proc/{pid}/stat") as f:
+        fields = f.read().rsplit(')', 1)[1].split()
+    return (int(fields[11]) + int(fields[12])) / os.sysconf('SC_CLK_TCK')
+
+# Rutas de lectura que se miden: (nombre, función que arma la ruta con ids al azar)
+def read_routes(rng, clients, pets):
+    return [
+        ("GET /clientes/{id}", lambda: f"/clientes/{rng.choice(clients)}"),
+        ("GET /clientes (página de 50)", lambda: f"/clientes?limite=50&despues={rng.choice(clients)}"),
+        ("GET /mascotas/{id}", lambda: f"/mascotas/{rng.choice(pets)}"),
+        ("GET /mascotas/{id}/historial", lambda: f"/mascotas/{rng.choice(pets)}/historial"),
+        ("GET /referencias", lambda: "/referencias"),
+    ]
+
+async def _ids(session, server, path, key):
+    async with session.get(f"{server}{path}?limite=1000") as response:
+        response.raise_for_status()
+        return [row[key] for row in (await response.json())['datos']]
+
+async def _measure(session, server, name, path, seconds, concurrency, pid):
+    latencies = []
+    errors = 0
+    stop = time.perf_counter() + seconds
+
+    async def client():
+        nonlocal errors
+        while time.perf_counter() < stop:
+            begin = time.perf_counter()
+            async with session.get(server + path()) as response:
+                await response.read()
+                if response.status != 200:
+                    errors += 1
+            latencies.append(time.perf_counter() - begin)
+
+    cpu = process_cpu_seconds(pid) if pid else None
+    started = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    result = {
+        'ruta': name,
+        'peticiones': len(latencies),
+        'errores': errors,
+        'pet_por_segundo': len(latencies) / elapsed,
+        'p50_ms': percentile(latencies, 0.50) * 1000,
+        'p99_ms': percentile(latencies, 0.99) * 1000,
+    }
+    if pid:
+        cpu = process_cpu_seconds(pid) - cpu
+        result['cpu_servidor_s'] = cpu
+        result['pet_por_nucleo'] = len(latencies) / cpu if cpu else None
+    return result
+
+async def run(server, seconds=BENCH_SECONDS, concurrency=BENCH_CONCURRENCY, pid=None, seed=42, only=None):
+    if aiohttp is None:
+        raise RuntimeError("Para la prueba de carga instale aiohttp (pip install aiohttp)")
+    rng = random.Random(seed)
+    connector = aiohttp.TCPConnector(limit=concurrency)
+    async with aiohttp.ClientSession(connector=connector) as session:
+        clients = await _ids(session, server, "/clientes", 'clienteid')
+        pets = await _ids(session, server, "/mascotas", 'mascotaid')
+        if not clients or not pets:
+            raise ValueError("El servidor no tiene clientes o mascotas: cargue datos con datos_sinteticos.py")
+        results = []
+        print(f"{'ruta':<32} {'n':>7} {'pet/s':>9} {'p50 ms':>8} {'p99 ms':>8} {'pet/s por núcleo':>17}")
+        for name, path in read_routes(rng, clients, pets):
+            if only and not any(word in name for word in only):
+                continue
+            result = await _measure(session, server, name, path, seconds, concurrency, pid)
+            results.append(result)
+            per_core = f"{result['pet_por_nucleo']:,.0f}" if result.get('pet_por_nucleo') else '-'
+            print(f"{name:<32} {result['peticiones']:>7} {result['pet_por_segundo']:>9,.0f} "
+                  f"{result['p50_ms']:>8.2f} {result['p99_ms']:>8.2f} {per_core:>17}"
+                  + (f"  ({result['errores']} errores)" if result['errores'] else ""))
+    return results
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Prueba de carga de las lecturas del servidor HTTP")
+    parser.add_argument("--servidor", default="http://127.0.0.1:8080")
+    parser.add_argument("--segundos", type=float, default=BENCH_SECONDS, help="Duración de cada ruta")
+    parser.add_argument("--concurrencia", type=int, default=BENCH_CONCURRENCY)
+    parser.add_argument("--pid", type=int, help="Proceso del servidor, para medir su tiempo de CPU")
+    parser.add_argument("--solo", nargs="*", help="Medir solo las rutas que contienen estas palabras")
+    parser.add_argument("--json", help="Guardar los resultados en este archivo")
+    args = parser.parse_args()
+
+    results = asyncio.run(run(args.servidor, args.segundos, args.concurrencia, args.pid, only=args.solo))
+    if args.json:
+        report = {
+            'fecha': datetime.now().isoformat(timespec='seconds'),
+            'servidor': args.servidor,
+            'python': platform.python_version(),
+            'concurrencia': args.concurrencia,
+            'resultados': results,
+        }
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+        print(f"Resultados guardados en {args.json}")
@@ -0,0 +1,111 @@
+import threading
+from collections import OrderedDict
+
+from sqlalchemy import select, bindparam
+
+from base import Clientes
+from configuracion import get_setting
+
+# Cantidad máxima de clientes que se guardan en memoria
+CLIENT_CACHE_SIZE = get_setting("CLIENT_CACHE_SIZE", 5000, int)
+
+# Columnas que se guardan de cada cliente (validar dueños y mostrar su nombre)
+CACHE_COLUMNS = (Clientes.clienteid, Clientes.nombre, Clientes.apellido, Clientes.email)
+
+# Consultas de la caché, armadas una sola vez (cada falta solo las ejecuta)
+_BY_ID = select(*CACHE_COLUMNS).where(Clientes.clienteid == bindparam('clienteid'))
+_BY_IDS = select(*CACHE_COLUMNS).where(Clientes.clienteid.in_(bindparam('ids', expanding=True)))
+_BY_EMAIL = select(*CACHE_COLUMNS).where(Clientes.email == bindparam('email'))
+
+# Caché de clientes por clienteid y por email con desalojo LRU. Se usa desde el
+# hilo de Tk y desde los hilos de la base de datos, por eso todo va con un lock.
+# Las escrituras de esta aplicación deben llamar a put()/invalidate(); si otro
+# puesto borra un cliente, el error de clave foránea al insertar lo invalida.
+class ClientCache:
+    def __init__(self, max_size=CLIENT_CACHE_SIZE):
+        self.max_size = max_size
+        self._by_id = OrderedDict()
+        self._by_email = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    # Devuelve el cliente (clienteid, nombre, apellido, email) o None si no existe
+    def get(self, db, clienteid):
+        row = self.peek(clienteid)
+        if row is not None:
+            return row
+        row = db.execute(_BY_ID, {'clienteid': clienteid}).first()
+        if row is not None:
+            self.put(row)
+        return row
+
+    # Igual que get() pero por email; cada búsqueda cuenta un solo acierto o falta
+    def get_by_email(self, db, email):
+        with self._lock:
+            row = self._by_id.get(self._by_email.get(email))
+            if row is not None:
+                self._by_id.move_to_end(row.clienteid)
+                self.hits += 1
+                return row
+            self.misses += 1
+        row = db.execute(_BY_EMAIL, {'email': email}).first()
+        if row is not None:
+            self.put(row)
+        return row
+
+    # Carga en una sola consulta los clientes que todavía no están en memoria
+    def get_many(self, db, ids):
+        with self._lock:
+            missing = [clienteid for clienteid in set(ids) if clienteid is not None and clienteid not in self._by_id]
+        if missing:
+            for row in db.execute(_BY_IDS, {'ids': missing}):
+                self.put(row)
+        with self._lock:
+            return {clienteid: self._by_id.get(clienteid) for clienteid in ids}
+
+    # Solo memoria: no consulta la base (sirve desde el hilo de Tk)
+    def peek(self, clienteid):
+        with self._lock:
+            row = self._by_id.get(clienteid)
+            if row is None:
+                self.misses += 1
+                return None
+            self._by_id.move_to_end(clienteid)
+            self.hits += 1
+            return row
+
+    def put(self, row):
+        with self._lock:
+            old = self._by_id.pop(row.clienteid, None)
+            if old is not None and old.email:
+                self._by_email.pop(old.email, None)
+            self._by_id[row.clienteid] = row
+            if row.email:
+                self._by_email[row.email] = row.clienteid
+            while len(self._by_id) > self.max_size:
+                _, evicted = self._by_id.popitem(last=False)
+                if evicted.email:
+                    self._by_email.pop(evicted.email, None)
+
+    def invalidate(self, clienteid=None, email=None):
+        with self._lock:
+            if clienteid is None and email is not None:
+                clienteid = self._by_email.get(email)
+            row = self._by_id.pop(clienteid, None)
+            if row is not None and row.email:
+                self._by_email.pop(row.email, None)
+            if email is not None:
+                self._by_email.pop(email, None)
+
+    def clear(self):
+        with self._lock:
+            self._by_id.clear()
+            self._by_email.clear()
+
+# Función para mostrar el nombre del dueño (solo con lo que ya está en memoria)
+def owner_name(row):
+    return f"{row.nombre or ''} {row.apellido or ''}".strip() if row is not None else ''
+
+# Caché compartida por toda la aplicación
+client_cache = ClientCache()
@@ -0,0 +1,26 @@
+import os
+import configparser
+
+# Archivo de configuración opcional (se puede cambiar con la variable VETERINARIA_CONFIG)
+CONFIG_FILE = os.environ.get(
+    "VETERINARIA_CONFIG",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "veterinaria.ini"),
+)
+
+_parser = configparser.ConfigParser()
+_parser.read(CONFIG_FILE, encoding="utf-8")
+
+_TRUE_VALUES = ("1", "true", "yes", "si", "sí", "on")
+
+# Función para leer una opción de configuración.
+# Primero se busca la variable de entorno (DATABASE_URL, DB_POOL_SIZE, ...) y
+# luego la clave en minúsculas dentro de la sección [veterinaria] del archivo .ini
+def get_setting(name, default=None, cast=str):
+    value = os.environ.get(name)
+    if value is None:
+        value = _parser.get("veterinaria", name.lower(), fallback=None)
+    if value is None or value == "":
+        return default
+    if cast is bool:
+        return value.strip().lower() in _TRUE_VALUES
+    return cast(value)
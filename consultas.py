@@ -0,0 +1,176 @@
+from functools import lru_cache
+
+from sqlalchemy import select, insert, delete, tuple_, or_, any_, bindparam, Integer
+from sqlalchemy.dialects.postgresql import ARRAY
+from sqlalchemy.orm import joinedload, selectinload
+
+from base import engine, get_db, Clientes, Mascotas, Citas, Ventas, DetalleVenta, TratamientosPorCita
+from configuracion import get_setting
+
+# Cantidad de filas que se cargan por página en las listas
+PAGE_SIZE = get_setting("LIST_PAGE_SIZE", 200, int)
+
+# Búsquedas: cantidad máxima de resultados y largo mínimo del texto (los índices
+# trigram necesitan al menos 3 caracteres)
+SEARCH_LIMIT = get_setting("SEARCH_LIMIT", 50, int)
+SEARCH_MIN_LENGTH = 3
+
+# Columnas donde se busca en cada lista
+SEARCH_COLUMNS = {
+    Clientes: (Clientes.nombre, Clientes.apellido, Clientes.email, Clientes.telefono),
+    Mascotas: (Mascotas.nombre,),
+}
+
+# Filas por lote al recorrer resultados grandes (exportaciones, informes)
+STREAM_BATCH_SIZE = get_setting("STREAM_BATCH_SIZE", 2000, int)
+
+# Columnas que muestra cada lista (la clave primaria va siempre para usarla como iid)
+LIST_COLUMNS = {
+    Clientes: (Clientes.clienteid, Clientes.nombre, Clientes.apellido, Clientes.direccion, Clientes.telefono, Clientes.email),
+    Mascotas: (Mascotas.mascotaid, Mascotas.nombre, Mascotas.especie, Mascotas.raza, Mascotas.fechanacimiento, Mascotas.clienteid),
+    Citas: (Citas.citaid, Citas.fecha, Citas.hora, Citas.mascotaid, Citas.veterinarioid, Citas.descripcion, Citas.duracion),
+    Ventas: (Ventas.ventaid, Ventas.fecha, Ventas.clienteid, Ventas.total),
+}
+
+# Relaciones que muestran las listas de objetos ORM: las de a uno se traen en el
+# mismo SELECT (joinedload) y las colecciones en una consulta más por página
+# (selectinload)
+LIST_LOADS = {
+    Citas: (
+        joinedload(Citas.mascota),
+        selectinload(Citas.tratamientos).joinedload(TratamientosPorCita.tratamiento),
+    ),
+    Ventas: (
+        joinedload(Ventas.cliente),
+        selectinload(Ventas.detalles).joinedload(DetalleVenta.producto),
+    ),
+}
+
+# Función para obtener las columnas que forman la clave de orden (orden + clave primaria)
+def keyset_columns(model, sort_columns=()):
+    return list(sort_columns) + list(model.__mapper__.primary_key)
+
+# Función para ejecutar fn(db, *args) con una sesión propia (útil desde hilos de fondo)
+def with_session(fn, *args):
+    db = next(get_db())
+    try:
+        return fn(db, *args)
+    finally:
+        db.close()
+
+# Función para ejecutar fn(conn, *args) con una conexión sin ORM (lecturas de listas)
+def with_connection(fn, *args):
+    with engine.connect() as conn:
+        return fn(conn, *args)
+
+# Función para armar la consulta de una página con paginación por clave (keyset).
+# "after" es la clave de la última fila ya mostrada (None para la primera página);
+# la consulta usa el índice de la clave y no depende del tamaño de la tabla.
+def keyset_select(model, entities, after=None, limit=PAGE_SIZE, sort_columns=()):
+    columns = keyset_columns(model, sort_columns)
+    stmt = select(*entities).order_by(*columns).limit(limit)
+    if after is not None:
+        if len(columns) == 1:
+            stmt = stmt.where(columns[0] > after[0])
+        else:
+            stmt = stmt.where(tuple_(*columns) > tuple_(*after))
+    return stmt
+
+# Igual que keyset_select pero con la clave y el límite como parámetros
+# (keyset_params): la sentencia se arma una sola vez por lista y después solo se
+# ejecuta. En las lecturas cortas del servidor armar el select costaba más CPU
+# que la consulta misma.
+@lru_cache(maxsize=None)
+def keyset_statement(model, entities, sort_columns=(), paged=False):
+    columns = keyset_columns(model, sort_columns)
+    stmt = select(*entities).order_by(*columns).limit(bindparam('limite', type_=Integer))
+    if paged:
+        after = [bindparam(f'despues_{position}', type_=column.type) for position, column in enumerate(columns)]
+        if len(columns) == 1:
+            stmt = stmt.where(columns[0] > after[0])
+        else:
+            stmt = stmt.where(tuple_(*columns) > tuple_(*after))
+    return stmt
+
+def keyset_params(after, limit):
+    params = {'limite': limit}
+    if after is not None:
+        params.update((f'despues_{position}', value) for position, value in enumerate(after))
+    return params
+
+# Función para leer una página de objetos ORM. "options" son las cargas de
+# relaciones (joinedload/selectinload) que necesita la lista: así la cantidad de
+# consultas por página es fija y no depende de cuántas filas se muestran.
+def fetch_page(db, model, after=None, limit=PAGE_SIZE, sort_columns=(), options=()):
+    stmt = keyset_select(model, (model,), after, limit, sort_columns).options(*options)
+    return db.execute(stmt).unique().scalars().all()
+
+# Igual que fetch_page pero para objetos puntuales (por ejemplo, uno recién agregado)
+def fetch_objects_by_ids(db, model, ids, options=()):
+    pk = model.__mapper__.primary_key[0]
+    stmt = select(model).where(pk.in_(list(ids))).order_by(pk).options(*options)
+    return db.execute(stmt).unique().scalars().all()
+
+# Función para leer una página solo con las columnas de la lista. Devuelve filas
+# livianas (tuplas con nombre) sin crear objetos ORM ni usar el mapa de identidad.
+def fetch_rows(conn, model, after=None, limit=PAGE_SIZE, sort_columns=(), columns=None):
+    stmt = keyset_statement(model, tuple(columns or LIST_COLUMNS[model]), tuple(sort_columns), after is not None)
+    return conn.execute(stmt, keyset_params(after, limit)).all()
+
+# Función para leer filas de lista por clave primaria (por ejemplo, la sugerencia elegida)
+def fetch_rows_by_ids(conn, model, ids):
+    return conn.execute(_rows_by_ids_statement(model), {'ids': list(ids)}).all()
+
+@lru_cache(maxsize=None)
+def _rows_by_ids_statement(model):
+    pk = model.__mapper__.primary_key[0]
+    return select(*LIST_COLUMNS[model]).where(pk.in_(bindparam('ids', expanding=True))).order_by(pk)
+
+# Función para buscar por texto parcial (sin distinguir mayúsculas) en las columnas
+# de SEARCH_COLUMNS. En PostgreSQL el ILIKE usa los índices trigram (esquema.py).
+def search_rows(conn, model, term, limit=SEARCH_LIMIT):
+    term = term.strip()
+    if len(term) < SEARCH_MIN_LENGTH:
+        return []
+    pattern = "%" + term.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+    conditions = [column.ilike(pattern, escape="\\") for column in SEARCH_COLUMNS[model]]
+    stmt = select(*LIST_COLUMNS[model]).where(or_(*conditions)).order_by(*model.__mapper__.primary_key).limit(limit)
+    return conn.execute(stmt).all()
+
+# Función para recorrer un resultado grande por lotes. En PostgreSQL usa un cursor
+# con nombre del lado del servidor, así la memoria no depende de cuántas filas
+# coincidan. Devuelve listas de filas livianas de hasta batch_size elementos.
+def stream_batches(stmt, batch_size=STREAM_BATCH_SIZE, bind=None):
+    bind = bind or engine
+    with bind.connect() as conn:
+        result = conn.execution_options(stream_results=True, yield_per=batch_size).execute(stmt)
+        for batch in result.partitions():
+            yield batch
+
+# Igual que stream_batches pero fila por fila
+def stream_rows(stmt, batch_size=STREAM_BATCH_SIZE, bind=None):
+    for batch in stream_batches(stmt, batch_size, bind):
+        yield from batch
+
+# Función para insertar una fila y devolverla completa en el mismo viaje (INSERT ... RETURNING)
+def insert_returning(db, model, values):
+    stmt = insert(model).values(**values).returning(*model.__table__.columns)
+    row = db.execute(stmt).one()
+    db.commit()
+    return row
+
+# Función para borrar varias filas por clave primaria en una sola sentencia y
+# transacción. Devuelve la lista de claves que realmente se borraron, o las filas
+# borradas con las columnas pedidas si se pasa "columns".
+def delete_returning(db, model, keys, columns=None):
+    pk = model.__mapper__.primary_key[0]
+    if db.get_bind().dialect.name == 'postgresql':
+        # "= ANY(:ids)" manda un solo parámetro de tipo arreglo, sea cual sea la cantidad
+        condition = pk == any_(bindparam('ids', list(keys), type_=ARRAY(pk.type)))
+    else:
+        condition = pk.in_(list(keys))
+    stmt = delete(model).where(condition).returning(*(columns or (pk,))).execution_options(synchronize_session=False)
+    result = db.execute(stmt)
+    deleted = result.all() if columns else result.scalars().all()
+    db.commit()
+    return deleted
@@ -0,0 +1,267 @@
+import os
+import sys
+import random
+import argparse
+import tempfile
+from datetime import date, time, timedelta, datetime
+from decimal import Decimal
+
+from sqlalchemy import create_engine, select, insert, func
+
+from base import (engine_options, enforce_foreign_keys, AuditoriaCitas, Citas, Clientes, DetalleVenta, Mascotas, Productos,
+                  Tratamientos, TratamientosPorCita, Ventas, Veterinarios)
+from esquema import migrate
+
+# Generador de datos sintéticos para pruebas de volumen. La escala es la cantidad
+# de citas; las demás tablas se dimensionan en proporción. Con la misma semilla
+# se generan siempre los mismos datos.
+#
+#   python datos_sinteticos.py --escala 100k                 (SQLite temporal)
+#   python datos_sinteticos.py --url postgresql://... --escala 1m
+
+SCALES = {'10k': 10_000, '100k': 100_000, '1m': 1_000_000}
+
+GENERATOR_BATCH_SIZE = 10000
+
+# Primer día de la agenda generada
+START_DATE = date(2023, 1, 2)
+
+# Bloques de 30 minutos por día y veterinario, desde las 9:00
+SLOTS_PER_DAY = 16
+
+# Días de agenda próxima (desde mañana) que se llenan para la búsqueda de horarios
+UPCOMING_DAYS = 30
+
+FIRST_NAMES = ("Ana", "Luis", "María", "José", "Lucía", "Carlos", "Sofía", "Jorge", "Valentina", "Diego",
+               "Camila", "Andrés", "Martina", "Pablo", "Gabriela", "Miguel", "Daniela", "Javier", "Paula", "Fernando")
+LAST_NAMES = ("García", "Rodríguez", "González", "Fernández", "López", "Martínez", "Sánchez", "Pérez", "Gómez",
+              "Díaz", "Torres", "Ramírez", "Flores", "Vargas", "Castro", "Romero", "Suárez", "Rojas", "Morales", "Ortiz")
+SPECIES = {
+    "Perro": ("Labrador", "Caniche", "Pastor Alemán", "Mestizo", "Bulldog", "Beagle"),
+    "Gato": ("Siamés", "Persa", "Mestizo", "Maine Coon"),
+    "Conejo": ("Enano", "Belier"),
+    "Ave": ("Canario", "Periquito", "Loro"),
+}
+PET_NAMES = ("Luna", "Max", "Rocky", "Toby", "Lola", "Simba", "Nala", "Coco", "Kira", "Bruno", "Milo", "Mia",
+             "Thor", "Frida", "Chispa", "Manchas", "Pelusa", "Canela", "Oreo", "Zeus")
+SPECIALTIES = ("General", "Cirugía", "Dermatología", "Cardiología", "Odontología", "Exóticos")
+TREATMENTS = ("Vacuna", "Desparasitación", "Antibiótico", "Antiinflamatorio", "Limpieza dental", "Curación",
+              "Control", "Análisis", "Radiografía", "Ecografía", "Castración", "Suero")
+PRODUCTS = ("Alimento", "Collar", "Correa", "Juguete", "Shampoo", "Antipulgas", "Arena", "Snack", "Cama", "Vitaminas")
+
+# Tamaño de cada tabla para una escala (cantidad de citas)
+def table_sizes(citas):
+    return {
+        'veterinarios': max(10, citas // 2000),
+        'clientes': max(10, citas // 5),
+        'mascotas': max(15, citas // 3),
+        'productos': 400,
+        'tratamientos': 120,
+        'citas': citas,
+        'ventas': citas // 2,
+        'auditoriacitas': citas // 2,
+    }
+
+def parse_scale(text):
+    text = text.strip().lower()
+    return SCALES[text] if text in SCALES else int(text)
+
+def _insert_batches(conn, model, rows, batch_size):
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= batch_size:
+            conn.execute(insert(model), batch)
+            batch = []
+    if batch:
+        conn.execute(insert(model), batch)
+
+# Las tablas se llenan vacías y en una sola sesión, así las claves generadas son
+# consecutivas desde la menor
+def _first_id(conn, pk):
+    return conn.execute(select(func.min(pk))).scalar()
+
+# Función para llenar todas las tablas. La base debe estar migrada y vacía.
+def generate(bind, citas, seed=42, batch_size=GENERATOR_BATCH_SIZE, verbose=True):
+    rng = random.Random(seed)
+    sizes = table_sizes(citas)
+    with bind.connect() as conn:
+        if conn.execute(select(func.count()).select_from(Clientes)).scalar():
+            raise ValueError("La base ya tiene datos: el generador necesita tablas vacías")
+
+    def log(message):
+        if verbose:
+            print(message)
+
+    with bind.begin() as conn:
+        log(f"veterinarios: {sizes['veterinarios']}")
+        _insert_batches(conn, Veterinarios, (
+            dict(nombre=rng.choice(FIRST_NAMES), apellido=rng.choice(LAST_NAMES),
+                 especialidad=SPECIALTIES[0] if i % 3 else rng.choice(SPECIALTIES),
+                 telefono=f"09{i:08d}", email=f"vet{i}@sintetico.test")
+            for i in range(sizes['veterinarios'])), batch_size)
+        first_vet = _first_id(conn, Veterinarios.veterinarioid)
+
+        log(f"productos: {sizes['productos']}, tratamientos: {sizes['tratamientos']}")
+        prices = [Decimal(rng.randint(100, 5000)) / 100 for _ in range(sizes['productos'])]
+        _insert_batches(conn, Productos, (
+            dict(nombre=f"{PRODUCTS[i % len(PRODUCTS)]} {i}", descripcion="Producto generado", precio=prices[i])
+            for i in range(sizes['productos'])), batch_size)
+        first_product = _first_id(conn, Productos.productoid)
+        _insert_batches(conn, Tratamientos, (
+            dict(nombre=f"{TREATMENTS[i % len(TREATMENTS)]} {i}", descripcion="Tratamiento generado")
+            for i in range(sizes['tratamientos'])), batch_size)
+        first_treatment = _first_id(conn, Tratamientos.tratamientoid)
+
+        log(f"clientes: {sizes['clientes']}")
+        _insert_batches(conn, Clientes, (
+            dict(nombre=rng.choice(FIRST_NAMES), apellido=f"{rng.choice(LAST_NAMES)} {rng.choice(LAST_NAMES)}",
+                 direccion=f"Calle {rng.randint(1, 999)} #{i}", telefono=f"09{i:08d}", email=f"cliente{i}@sintetico.test")
+            for i in range(sizes['clientes'])), batch_size)
+        first_client = _first_id(conn, Clientes.clienteid)
+
+        log(f"mascotas: {sizes['mascotas']}")
+        species = list(SPECIES)
+
+        def pets():
+            for i in range(sizes['mascotas']):
+                especie = species[min(int(rng.expovariate(1.2)), len(species) - 1)]
+                yield dict(nombre=rng.choice(PET_NAMES), especie=especie, raza=rng.choice(SPECIES[especie]),
+                           fechanacimiento=START_DATE - timedelta(days=rng.randint(60, 5000)),
+                           clienteid=first_client + rng.randrange(sizes['clientes']))
+        _insert_batches(conn, Mascotas, pets(), batch_size)
+        first_pet = _first_id(conn, Mascotas.mascotaid)
+
+        # Cada veterinario ocupa alrededor del 80 % de sus bloques, sin solapamientos
+        log(f"citas: {sizes['citas']}")
+        vets = sizes['veterinarios']
+        last_date = [START_DATE]
+
+        def appointments():
+            slot = 0
+            made = 0
+            while made < sizes['citas']:
+                day, rest = divmod(slot, vets * SLOTS_PER_DAY)
+                block, vet = divmod(rest, vets)
+                slot += 1
+                if rng.random() >= 0.8:
+                    continue
+                made += 1
+                fecha = START_DATE + timedelta(days=day)
+                last_date[0] = fecha
+                minutes = 9 * 60 + block * 30
+                yield dict(fecha=fecha, hora=time(minutes // 60, minutes % 60), duracion=30,
+                           mascotaid=first_pet + rng.randrange(sizes['mascotas']), veterinarioid=first_vet + vet,
+                           descripcion=rng.choice(("Control", "Vacunación", "Consulta", "Urgencia", None)))
+        _insert_batches(conn, Citas, appointments(), batch_size)
+        first_appointment = _first_id(conn, Citas.citaid)
+        days = (last_date[0] - START_DATE).days + 1
+
+        log("tratamientosporcita")
+
+        def treatments():
+            for citaid in range(first_appointment, first_appointment + sizes['citas']):
+                for tratamientoid in rng.sample(range(sizes['tratamientos']), rng.choice((0, 0, 1, 1, 1, 2))):
+                    yield dict(citaid=citaid, tratamientoid=first_treatment + tratamientoid,
+                               dosis=f"{rng.randint(1, 20)} ml", duracion=rng.choice((1, 3, 5, 7, 10)))
+        _insert_batches(conn, TratamientosPorCita, treatments(), batch_size)
+
+        # Las líneas se arman junto con las ventas para que el total cuadre
+        log(f"ventas: {sizes['ventas']} y detalleventa")
+        lines = []
+
+        def sales():
+            for i in range(sizes['ventas']):
+                items = rng.sample(range(sizes['productos']), rng.randint(1, 3))
+                quantities = [rng.randint(1, 4) for _ in items]
+                lines.append(list(zip(items, quantities)))
+                yield dict(fecha=START_DATE + timedelta(days=rng.randrange(days)),
+                           clienteid=first_client + rng.randrange(sizes['clientes']) if rng.random() < 0.8 else None,
+                           total=sum(prices[item] * quantity for item, quantity in zip(items, quantities)))
+        _insert_batches(conn, Ventas, sales(), batch_size)
+        first_sale = _first_id(conn, Ventas.ventaid)
+        _insert_batches(conn, DetalleVenta, (
+            dict(ventaid=first_sale + i, productoid=first_product + item, cantidad=quantity, preciounitario=prices[item])
+            for i, sale_lines in enumerate(lines) for item, quantity in sale_lines), batch_size)
+
+        log(f"auditoriacitas: {sizes['auditoriacitas']}")
+        start = datetime.combine(START_DATE, time(8))
+        _insert_batches(conn, AuditoriaCitas, (
+            dict(citaid=first_appointment + rng.randrange(sizes['citas']), accion=rng.choice(('alta', 'alta', 'cambio', 'baja')),
+                 fecha=START_DATE, hora=time(9), mascotaid=first_pet, veterinarioid=first_vet,
+                 fecharegistro=start + timedelta(minutes=rng.randrange(days * 24 * 60)))
+            for _ in range(sizes['auditoriacitas'])), batch_size)
+
+    # Estadísticas al día para el planificador
+    with bind.begin() as conn:
+        conn.exec_driver_sql("ANALYZE")
+    return sizes
+
+# Base por defecto para una escala: un SQLite temporal
+def default_url(scale):
+    return "sqlite:///" + os.path.join(tempfile.gettempdir(), f"veterinaria_sintetica_{scale.strip().lower()}.db")
+
+# Función para crear un motor para pruebas
+def bench_engine(url):
+    options = engine_options(url)
+    options["echo"] = False
+    return enforce_foreign_keys(create_engine(url, **options))
+
+# Función para llenar la agenda de los próximos "days" días (desde mañana) con la
+# misma ocupación que la agenda generada. La búsqueda de horarios libres saltea los
+# días pasados, así que sin esto no tendría ocupación que leer. Si ya hay citas
+# futuras no hace nada; devuelve la cantidad de citas agregadas.
+def generate_upcoming(bind, days=UPCOMING_DAYS, seed=42, batch_size=GENERATOR_BATCH_SIZE, verbose=True):
+    rng = random.Random(seed)
+    first = date.today() + timedelta(days=1)
+    with bind.connect() as conn:
+        if conn.execute(select(func.count()).select_from(Citas).where(Citas.fecha >= first)).scalar():
+            return 0
+        vets = conn.execute(select(Veterinarios.veterinarioid).order_by(Veterinarios.veterinarioid)).scalars().all()
+        pets = conn.execute(select(func.min(Mascotas.mascotaid), func.max(Mascotas.mascotaid))).one()
+    if not vets or pets[0] is None:
+        return 0
+    if verbose:
+        print(f"agenda próxima: {days} días desde {first}")
+    made = [0]
+
+    def appointments():
+        for day in range(days):
+            for block in range(SLOTS_PER_DAY):
+                for vet in vets:
+                    if rng.random() >= 0.8:
+                        continue
+                    made[0] += 1
+                    minutes = 9 * 60 + block * 30
+                    yield dict(fecha=first + timedelta(days=day), hora=time(minutes // 60, minutes % 60), duracion=30,
+                               mascotaid=rng.randint(*pets), veterinarioid=vet, descripcion="Control")
+    with bind.begin() as conn:
+        _insert_batches(conn, Citas, appointments(), batch_size)
+    return made[0]
+
+# Función para dejar una base migrada y con datos de la escala pedida
+def prepare(bind, citas, seed=42, verbose=True):
+    migrate(bind)
+    with bind.connect() as conn:
+        empty = not conn.execute(select(func.count()).select_from(Clientes)).scalar()
+    if empty:
+        generate(bind, citas, seed, verbose=verbose)
+    generate_upcoming(bind, seed=seed, verbose=verbose)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generador de datos sintéticos")
+    parser.add_argument("--url", help="Base de datos a llenar (por defecto un SQLite temporal)")
+    parser.add_argument("--escala", default="10k", help="Cantidad de citas: 10k, 100k, 1m o un número")
+    parser.add_argument("--semilla", type=int, default=42)
+    args = parser.parse_args()
+
+    citas = parse_scale(args.escala)
+    target = bench_engine(args.url or default_url(args.escala))
+    migrate(target)
+    try:
+        generate(target, citas, args.semilla)
+        generate_upcoming(target, seed=args.semilla)
+    except ValueError as e:
+        print(e)
+        sys.exit(1)
+    print(f"Listo: {target.url}")
@@ -0,0 +1,111 @@
+import tkinter as tk
+from tkinter import ttk, messagebox, filedialog
+import ttkbootstrap as ttkb
+
+from base import engine, pool_stats
+from instrumentacion import sql_stats
+
+# Columnas de cada tabla del panel: (título, clave en instrumentacion, formato)
+STATEMENT_COLUMNS = (
+    ('Sentencia', 'sql', str),
+    ('Veces', 'veces', str),
+    ('Total ms', 'total_ms', '{:.1f}'.format),
+    ('Media ms', 'media_ms', '{:.2f}'.format),
+    ('p50 ms', 'p50_ms', '{:.2f}'.format),
+    ('p99 ms', 'p99_ms', '{:.2f}'.format),
+    ('Máx ms', 'max_ms', '{:.2f}'.format),
+    ('Filas', 'filas', str),
+)
+ACTION_COLUMNS = (
+    ('Acción', 'accion', str),
+    ('Veces', 'veces', str),
+    ('Sentencias/vez', 'sentencias_por_vez', '{:.1f}'.format),
+    ('Máx sentencias', 'max_sentencias', str),
+    ('ms en la base/vez', 'ms_base_por_vez', '{:.2f}'.format),
+    ('ms total/vez', 'ms_por_vez', '{:.2f}'.format),
+)
+SLOW_COLUMNS = (
+    ('Fecha', 'fecha', str),
+    ('ms', 'ms', '{:.1f}'.format),
+    ('Filas', 'filas', lambda value: '' if value is None else str(value)),
+    ('Acción', 'accion', lambda value: value or ''),
+    ('Sentencia', 'sql', str),
+)
+
+# Panel de diagnóstico: estadísticas de SQL (instrumentacion.py) y estado del
+# pool. Solo lee memoria, así que se actualiza desde el hilo de Tk sin consultas.
+class DiagnosticsPanel:
+    def __init__(self, parent, bind=engine):
+        self.bind = bind
+        frame = ttk.LabelFrame(parent, text='Diagnóstico de SQL')
+        frame.pack(fill='both', expand=True, padx=20, pady=10)
+
+        toolbar = ttk.Frame(frame)
+        toolbar.pack(fill='x', pady=5)
+        self.enabled = tk.BooleanVar(value=sql_stats.enabled)
+        ttk.Checkbutton(toolbar, text="Registrar sentencias", variable=self.enabled, command=self.toggle).pack(side='left', padx=5)
+        ttkb.Button(toolbar, text="Actualizar", style="info.TButton", command=self.refresh).pack(side='left', padx=5)
+        ttkb.Button(toolbar, text="Reiniciar", style="danger.TButton", command=self.reset).pack(side='left', padx=5)
+        ttkb.Button(toolbar, text="Exportar...", style="success.TButton", command=self.export).pack(side='left', padx=5)
+        self.summary_label = ttk.Label(toolbar, text="")
+        self.summary_label.pack(side='left', padx=10)
+
+        tables = ttk.Notebook(frame)
+        tables.pack(fill='both', expand=True)
+        self.statement_tree = self._table(tables, 'Sentencias', STATEMENT_COLUMNS)
+        self.action_tree = self._table(tables, 'Acciones', ACTION_COLUMNS)
+        self.slow_tree = self._table(tables, 'Lentas', SLOW_COLUMNS)
+        self.statement_tree.column('Sentencia', width=500)
+        self.slow_tree.column('Sentencia', width=500)
+        self.refresh()
+
+    def _table(self, notebook, title, columns):
+        tree_frame = ttk.Frame(notebook)
+        notebook.add(tree_frame, text=title)
+        tree = ttk.Treeview(tree_frame, columns=[heading for heading, _, _ in columns], show='headings')
+        for heading, _, _ in columns:
+            tree.heading(heading, text=heading)
+            tree.column(heading, width=90, stretch=True)
+        tree.pack(side='left', fill='both', expand=True)
+        scrollbar = ttk.Scrollbar(tree_frame, orient='vertical', command=tree.yview)
+        scrollbar.pack(side='right', fill='y')
+        tree.configure(yscrollcommand=scrollbar.set)
+        return tree
+
+    def _fill(self, tree, columns, items):
+        tree.delete(*tree.get_children())
+        for item in items:
+            tree.insert('', 'end', values=[formatter(item[key]) for _, key, formatter in columns])
+
+    def toggle(self):
+        if self.enabled.get():
+            sql_stats.attach(self.bind)
+        else:
+            sql_stats.detach(self.bind)
+        self.refresh()
+
+    def refresh(self):
+        snapshot = sql_stats.snapshot()
+        self._fill(self.statement_tree, STATEMENT_COLUMNS, snapshot['sentencias'])
+        self._fill(self.action_tree, ACTION_COLUMNS, snapshot['acciones'])
+        self._fill(self.slow_tree, SLOW_COLUMNS, reversed(snapshot['lentas']))
+        total = sum(item['veces'] for item in snapshot['sentencias'])
+        pool = pool_stats()
+        state = "activo" if snapshot['activo'] else "apagado"
+        self.summary_label.config(
+            text=f"Registro {state} desde {snapshot['desde']} - {total} sentencias - "
+                 f"lentas: >= {snapshot['umbral_lento_ms']:g} ms - pool: {pool['status']}")
+
+    def reset(self):
+        sql_stats.reset()
+        self.refresh()
+
+    def export(self):
+        path = filedialog.asksaveasfilename(defaultextension=".json",
+                                            filetypes=[("JSON", "*.json"), ("CSV (sentencias)", "*.csv")])
+        if not path:
+            return
+        try:
+            sql_stats.export(path)
+        except OSError as e:
+            messagebox.showerror("Error", f"Error al exportar: {e}")
@@ -0,0 +1,242 @@
+import sys
+import hashlib
+
+from sqlalchemy import MetaData, Table, Column, Integer, String, TIMESTAMP, select, func, insert, update, inspect, text
+from sqlalchemy.schema import CreateTable, CreateIndex
+
+from base import engine, Base, Citas, Productos, Tratamientos, Veterinarios
+
+# Tabla donde se guarda la versión del esquema. Va en su propio MetaData para
+# que no forme parte de la huella de los modelos.
+_version_metadata = MetaData()
+esquema_version = Table(
+    'esquema_version', _version_metadata,
+    Column('id', Integer, primary_key=True),
+    Column('version', Integer, nullable=False),
+    Column('huella', String(64), nullable=False),
+    Column('aplicado', TIMESTAMP, server_default=func.current_timestamp()),
+)
+
+class SchemaError(RuntimeError):
+    pass
+
+# Migración 1: crear las tablas de los modelos (no hace nada si ya existen)
+def _create_tables(conn):
+    Base.metadata.create_all(bind=conn)
+
+# Migración 2: índices trigram (pg_trgm) para las búsquedas por texto parcial.
+# Solo PostgreSQL; en otras bases la búsqueda funciona sin estos índices.
+TRIGRAM_INDEXES = {
+    'ix_clientes_nombre_trgm': ('clientes', 'nombre'),
+    'ix_clientes_apellido_trgm': ('clientes', 'apellido'),
+    'ix_clientes_email_trgm': ('clientes', 'email'),
+    'ix_clientes_telefono_trgm': ('clientes', 'telefono'),
+    'ix_mascotas_nombre_trgm': ('mascotas', 'nombre'),
+}
+
+def _create_trigram_indexes(conn):
+    if conn.dialect.name != 'postgresql':
+        return
+    conn.exec_driver_sql("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    for name, (table, column) in TRIGRAM_INDEXES.items():
+        conn.exec_driver_sql(f"CREATE INDEX IF NOT EXISTS {name} ON {table} USING gin ({column} gin_trgm_ops)")
+
+# Citas ya cruzadas que impedirían crear la restricción (hasta "limit" pares). Se
+# comparan citas del mismo veterinario a un día o menos, con el índice (veterinarioid, fecha).
+OVERLAP_REPORT_LIMIT = 50
+
+def _check_no_overlaps(conn, limit=OVERLAP_REPORT_LIMIT):
+    pairs = conn.execute(text(
+        "SELECT a.citaid, b.citaid FROM citas a JOIN citas b"
+        " ON b.veterinarioid = a.veterinarioid AND b.citaid > a.citaid"
+        " AND b.fecha BETWEEN a.fecha - 1 AND a.fecha + 1"
+        " AND tsrange(a.fecha + a.hora, a.fecha + a.hora + a.duracion * interval '1 minute')"
+        " && tsrange(b.fecha + b.hora, b.fecha + b.hora + b.duracion * interval '1 minute')"
+        " ORDER BY a.citaid, b.citaid LIMIT :limit"), {'limit': limit + 1}).all()
+    if pairs:
+        listed = ", ".join(f"{first}-{second}" for first, second in pairs[:limit])
+        more = " (y otros)" if len(pairs) > limit else ""
+        raise SchemaError(
+            "No se puede crear el control de solapamientos: hay citas del mismo veterinario que se "
+            f"cruzan (pares de citaid: {listed}{more}). Corríjalas y vuelva a ejecutar: python esquema.py migrate"
+        )
+
+# Migración 3: duración de las citas y control de solapamientos por veterinario.
+# En PostgreSQL una restricción de exclusión (btree_gist) impide que dos citas del
+# mismo veterinario se crucen, aun con varios puestos agendando a la vez.
+def _add_appointment_overlap(conn):
+    columns = {column['name'] for column in inspect(conn).get_columns('citas')}
+    if 'duracion' not in columns:
+        conn.exec_driver_sql("ALTER TABLE citas ADD COLUMN duracion INTEGER NOT NULL DEFAULT 30")
+    for index in Citas.__table__.indexes:
+        index.create(bind=conn, checkfirst=True)
+    if conn.dialect.name != 'postgresql':
+        return
+    conn.exec_driver_sql("CREATE EXTENSION IF NOT EXISTS btree_gist")
+    exists = conn.execute(text("SELECT 1 FROM pg_constraint WHERE conname = 'citas_sin_solapamiento'")).first()
+    if exists is None:
+        _check_no_overlaps(conn)
+        conn.exec_driver_sql(
+            "ALTER TABLE citas ADD CONSTRAINT citas_sin_solapamiento EXCLUDE USING gist ("
+            "veterinarioid WITH =, "
+            "tsrange(fecha + hora, fecha + hora + duracion * interval '1 minute') WITH &&)"
+        )
+
+# Migración 4: tipo de evento en auditoriacitas y fecha de registro por defecto
+# del lado del servidor (antes se guardaba el texto "CURRENT_TIMESTAMP")
+def _add_audit_action(conn):
+    columns = {column['name'] for column in inspect(conn).get_columns('auditoriacitas')}
+    if 'accion' not in columns:
+        conn.exec_driver_sql("ALTER TABLE auditoriacitas ADD COLUMN accion VARCHAR(10)")
+    if conn.dialect.name == 'postgresql':
+        conn.exec_driver_sql("ALTER TABLE auditoriacitas ALTER COLUMN fecharegistro SET DEFAULT CURRENT_TIMESTAMP")
+
+# Migración 5: marca de última modificación en las tablas de referencia. En
+# PostgreSQL un trigger la actualiza también cuando se modifica la fila desde
+# fuera de la aplicación.
+REFERENCE_TABLES = (Productos, Tratamientos, Veterinarios)
+
+def _add_reference_timestamps(conn):
+    postgres = conn.dialect.name == 'postgresql'
+    if postgres:
+        conn.exec_driver_sql(
+            "CREATE OR REPLACE FUNCTION marcar_actualizado() RETURNS trigger AS $$ "
+            "BEGIN NEW.actualizado = CURRENT_TIMESTAMP; RETURN NEW; END; $$ LANGUAGE plpgsql"
+        )
+    for model in REFERENCE_TABLES:
+        table = model.__tablename__
+        columns = {column['name'] for column in inspect(conn).get_columns(table)}
+        if 'actualizado' not in columns:
+            if postgres:
+                conn.exec_driver_sql(f"ALTER TABLE {table} ADD COLUMN actualizado TIMESTAMP DEFAULT CURRENT_TIMESTAMP")
+            else:
+                # SQLite no acepta un DEFAULT no constante al agregar una columna
+                conn.exec_driver_sql(f"ALTER TABLE {table} ADD COLUMN actualizado TIMESTAMP")
+                conn.exec_driver_sql(f"UPDATE {table} SET actualizado = CURRENT_TIMESTAMP")
+        for index in model.__table__.indexes:
+            index.create(bind=conn, checkfirst=True)
+        if postgres:
+            conn.exec_driver_sql(f"DROP TRIGGER IF EXISTS {table}_actualizado ON {table}")
+            conn.exec_driver_sql(
+                f"CREATE TRIGGER {table}_actualizado BEFORE UPDATE ON {table} "
+                f"FOR EACH ROW EXECUTE FUNCTION marcar_actualizado()"
+            )
+
+# Migración 7: índices compuestos y parciales de las consultas frecuentes
+# (agenda, historial, compras por cliente, ventas por producto); ver planes.py.
+# Incluye el del historial por mascota, que antes tenía su propia migración 6:
+# los tratamientos de cada cita se leen por la clave primaria de
+# tratamientosporcita (citaid, tratamientoid).
+def _create_model_indexes(conn):
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(bind=conn, checkfirst=True)
+
+# Migración 8: control de solapamientos en SQLite. Triggers que rechazan la cita
+# dentro de la misma sentencia de escritura (SQLite tiene un solo escritor a la
+# vez), con el nombre de la restricción de PostgreSQL en el mensaje para que
+# agenda.py trate el error igual en las dos bases. Como find_conflict, compara
+# con las citas del día anterior hasta el día en que termina la nueva.
+def _overlap_condition(exclude_self):
+    start = "CAST(strftime('%s', {0}.fecha || ' ' || {0}.hora) AS INTEGER)"
+    return (
+        "EXISTS (SELECT 1 FROM citas c WHERE c.veterinarioid = NEW.veterinarioid"
+        " AND c.fecha BETWEEN date(NEW.fecha, '-1 day')"
+        " AND date(NEW.fecha || ' ' || NEW.hora, '+' || NEW.duracion || ' minutes')"
+        f" AND {start.format('c')} < {start.format('NEW')} + NEW.duracion * 60"
+        f" AND {start.format('c')} + c.duracion * 60 > {start.format('NEW')}"
+        + (" AND c.citaid <> NEW.citaid" if exclude_self else "") + ")"
+    )
+
+def _add_sqlite_overlap_triggers(conn):
+    if conn.dialect.name != 'sqlite':
+        return
+    for name, event, exclude_self in (('citas_sin_solapamiento_alta', 'INSERT', False),
+                                      ('citas_sin_solapamiento_cambio', 'UPDATE OF fecha, hora, duracion, veterinarioid', True)):
+        conn.exec_driver_sql(
+            f"CREATE TRIGGER IF NOT EXISTS {name} BEFORE {event} ON citas "
+            f"WHEN {_overlap_condition(exclude_self)} "
+            f"BEGIN SELECT RAISE(ABORT, 'citas_sin_solapamiento'); END"
+        )
+
+# Lista ordenada de migraciones: (versión, descripción, función que recibe la conexión).
+# Los números no se reutilizan: la 6 se unió a la 7 y una base que quedó en la 6
+# solo aplica las siguientes.
+MIGRATIONS = [
+    (1, "Tablas iniciales", _create_tables),
+    (2, "Índices trigram para búsquedas", _create_trigram_indexes),
+    (3, "Duración de citas y control de solapamientos", _add_appointment_overlap),
+    (4, "Acción en la auditoría de citas", _add_audit_action),
+    (5, "Marca de modificación en datos de referencia", _add_reference_timestamps),
+    (7, "Índices de consultas frecuentes", _create_model_indexes),
+    (8, "Control de solapamientos de citas en SQLite", _add_sqlite_overlap_triggers),
+]
+
+SCHEMA_VERSION = MIGRATIONS[-1][0]
+
+# Función para calcular la huella del esquema a partir del DDL de los modelos
+def schema_fingerprint(dialect=None):
+    dialect = dialect or engine.dialect
+    statements = []
+    for table in Base.metadata.sorted_tables:
+        statements.append(str(CreateTable(table).compile(dialect=dialect)).strip())
+        for index in sorted(table.indexes, key=lambda index: index.name or ''):
+            statements.append(str(CreateIndex(index).compile(dialect=dialect)).strip())
+    return hashlib.sha256("\n".join(statements).encode("utf-8")).hexdigest()
+
+# Función para leer la versión guardada (None si la base aún no fue migrada)
+def _stored_version(conn):
+    return conn.execute(select(esquema_version.c.version, esquema_version.c.huella)
+                        .where(esquema_version.c.id == 1)).first()
+
+# Función para verificar el esquema al iniciar: sin DDL. Solo la falta de la
+# tabla de versiones quiere decir "base sin migrar"; un error de conexión o de
+# permisos se propaga tal cual para no confundirlo con eso.
+def check_schema(bind=None):
+    bind = bind or engine
+    with bind.connect() as conn:
+        row = _stored_version(conn) if inspect(conn).has_table(esquema_version.name) else None
+    if row is None:
+        raise SchemaError("La base de datos no tiene esquema registrado. Ejecute: python esquema.py migrate")
+    if row.version != SCHEMA_VERSION or row.huella != schema_fingerprint(bind.dialect):
+        raise SchemaError(
+            f"El esquema de la base de datos (versión {row.version}) no coincide con la aplicación "
+            f"(versión {SCHEMA_VERSION}). Ejecute: python esquema.py migrate"
+        )
+    return row.version
+
+# Función para aplicar las migraciones pendientes y registrar la nueva huella
+def migrate(bind=None):
+    bind = bind or engine
+    with bind.begin() as conn:
+        _version_metadata.create_all(bind=conn)
+        row = _stored_version(conn)
+        current = row.version if row is not None else 0
+        for version, description, step in MIGRATIONS:
+            if version > current:
+                print(f"Aplicando migración {version}: {description}")
+                step(conn)
+        values = {'version': SCHEMA_VERSION, 'huella': schema_fingerprint(conn.dialect), 'aplicado': func.current_timestamp()}
+        if row is None:
+            conn.execute(insert(esquema_version).values(id=1, **values))
+        else:
+            conn.execute(update(esquema_version).where(esquema_version.c.id == 1).values(**values))
+    return SCHEMA_VERSION
+
+if __name__ == "__main__":
+    command = sys.argv[1] if len(sys.argv) > 1 else "check"
+    if command == "migrate":
+        try:
+            print(f"Esquema actualizado a la versión {migrate()}")
+        except SchemaError as e:
+            print(e)
+            sys.exit(1)
+    elif command == "check":
+        try:
+            print(f"Esquema correcto (versión {check_schema()})")
+        except SchemaError as e:
+            print(e)
+            sys.exit(1)
+    else:
+        print("Uso: python esquema.py [check|migrate]")
+        sys.exit(2)
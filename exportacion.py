@@ -0,0 +1,140 @@
+import csv
+import sys
+import argparse
+from datetime import date
+
+from sqlalchemy import select, Date, Time, Integer, Numeric, String, TIMESTAMP
+
+from base import engine, Base
+from consultas import stream_batches
+from configuracion import get_setting
+
+# Exportación de cualquier tabla de base.py a CSV o Parquet, por lotes.
+#
+#   python exportacion.py citas citas_2024.csv --desde 2024-01-01 --hasta 2024-12-31
+#   python exportacion.py detalleventa detalle.parquet --desde 2024-01-01
+#
+# En PostgreSQL el CSV sale directamente con COPY ... TO STDOUT; en los demás
+# casos se recorre un cursor del servidor por lotes, así la memoria no crece.
+
+EXPORT_BATCH_SIZE = get_setting("EXPORT_BATCH_SIZE", 50000, int)
+
+# Columna de fecha usada para filtrar cada tabla. detalleventa no tiene fecha
+# propia: se filtra por la fecha de su venta.
+DATE_COLUMNS = {
+    'citas': 'fecha',
+    'ventas': 'fecha',
+    'auditoriacitas': 'fecharegistro',
+}
+
+# Función para armar la consulta de exportación con el filtro de fechas
+def export_select(table_name, since=None, until=None):
+    tables = Base.metadata.tables
+    if table_name not in tables:
+        raise ValueError(f"Tabla desconocida: {table_name}")
+    table = tables[table_name]
+    stmt = select(table).order_by(*table.primary_key.columns)
+    if since is None and until is None:
+        return stmt
+    if table_name == 'detalleventa':
+        ventas = tables['ventas']
+        stmt = stmt.where(table.c.ventaid.in_(_date_filter(select(ventas.c.ventaid), ventas.c.fecha, since, until)))
+    elif table_name in DATE_COLUMNS:
+        stmt = _date_filter(stmt, table.c[DATE_COLUMNS[table_name]], since, until)
+    else:
+        raise ValueError(f"La tabla {table_name} no tiene una fecha para filtrar")
+    return stmt
+
+def _date_filter(stmt, column, since, until):
+    if since is not None:
+        stmt = stmt.where(column >= since)
+    if until is not None:
+        # "hasta" incluye todo ese día, también en columnas con hora
+        stmt = stmt.where(column < date.fromordinal(until.toordinal() + 1))
+    return stmt
+
+# Función para exportar a CSV; devuelve la cantidad de filas escritas
+def export_csv(stmt, path, bind=None, batch_size=EXPORT_BATCH_SIZE):
+    bind = bind or engine
+    if bind.dialect.name == 'postgresql':
+        return _copy_to(stmt, path, bind)
+    rows = 0
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow([column.name for column in stmt.selected_columns])
+        for batch in stream_batches(stmt, batch_size, bind):
+            writer.writerows(batch)
+            rows += len(batch)
+    return rows
+
+def _copy_to(stmt, path, bind):
+    sql = str(stmt.compile(dialect=bind.dialect, compile_kwargs={'literal_binds': True}))
+    copy_sql = f"COPY ({sql}) TO STDOUT WITH (FORMAT csv, HEADER true)"
+    with bind.connect() as conn, open(path, 'wb') as f:
+        cursor = conn.connection.cursor()
+        if hasattr(cursor, 'copy_expert'):
+            # psycopg2
+            cursor.copy_expert(copy_sql, f)
+        else:
+            # psycopg 3
+            with cursor.copy(copy_sql) as copy:
+                for data in copy:
+                    f.write(data)
+        rows = cursor.rowcount
+        cursor.close()
+    return rows
+
+# Función para convertir los tipos de SQLAlchemy a tipos de Arrow (esquema fijo
+# para que todos los lotes del archivo Parquet coincidan)
+def _arrow_type(pa, column_type):
+    if isinstance(column_type, Integer):
+        return pa.int64()
+    if isinstance(column_type, Numeric):
+        return pa.decimal128(column_type.precision or 38, column_type.scale or 0)
+    if isinstance(column_type, TIMESTAMP):
+        return pa.timestamp('us')
+    if isinstance(column_type, Date):
+        return pa.date32()
+    if isinstance(column_type, Time):
+        return pa.time64('us')
+    if isinstance(column_type, String):
+        return pa.string()
+    raise ValueError(f"Tipo no soportado para Parquet: {column_type}")
+
+# Función para exportar a Parquet (requiere pyarrow); un grupo de filas por lote
+def export_parquet(stmt, path, bind=None, batch_size=EXPORT_BATCH_SIZE):
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise ValueError("Para exportar a Parquet instale pyarrow (pip install pyarrow)")
+    columns = list(stmt.selected_columns)
+    schema = pa.schema([pa.field(column.name, _arrow_type(pa, column.type)) for column in columns])
+    rows = 0
+    with pq.ParquetWriter(path, schema) as writer:
+        for batch in stream_batches(stmt, batch_size, bind):
+            arrays = [pa.array([row[i] for row in batch], type=field.type) for i, field in enumerate(schema)]
+            writer.write_table(pa.Table.from_arrays(arrays, schema=schema))
+            rows += len(batch)
+    return rows
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Exportación de tablas a CSV o Parquet")
+    parser.add_argument("tabla", choices=sorted(Base.metadata.tables))
+    parser.add_argument("archivo")
+    parser.add_argument("--desde", type=date.fromisoformat, help="Fecha inicial (YYYY-MM-DD)")
+    parser.add_argument("--hasta", type=date.fromisoformat, help="Fecha final, incluida (YYYY-MM-DD)")
+    parser.add_argument("--formato", choices=("csv", "parquet"), help="Por defecto según la extensión del archivo")
+    parser.add_argument("--lote", type=int, default=EXPORT_BATCH_SIZE)
+    args = parser.parse_args()
+    file_format = args.formato or ("parquet" if args.archivo.endswith(".parquet") else "csv")
+    try:
+        stmt = export_select(args.tabla, args.desde, args.hasta)
+        if file_format == "parquet":
+            rows = export_parquet(stmt, args.archivo, batch_size=args.lote)
+        else:
+            rows = export_csv(stmt, args.archivo, batch_size=args.lote)
+    except ValueError as e:
+        print(f"Error: {e}")
+        sys.exit(1)
+    print(f"{rows} filas exportadas a {args.archivo}")
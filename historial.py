@@ -0,0 +1,74 @@
+from collections import namedtuple
+from functools import lru_cache
+
+from sqlalchemy import select, tuple_, bindparam, Integer
+
+from base import engine, Citas, TratamientosPorCita, Tratamientos
+from configuracion import get_setting
+
+# Visitas por página del historial
+HISTORY_PAGE_SIZE = get_setting("HISTORY_PAGE_SIZE", 50, int)
+
+# Una visita del historial con sus tratamientos [(nombre, dosis, duracion), ...]
+Visit = namedtuple('Visit', 'citaid fecha hora duracion veterinarioid descripcion tratamientos')
+Treatment = namedtuple('Treatment', 'tratamientoid nombre dosis duracion')
+
+# Clave de orden del historial (más reciente primero); coincide con el índice
+# ix_citas_mascota_fecha (mascotaid, fecha DESC, hora DESC, citaid DESC)
+HISTORY_ORDER = (Citas.fecha, Citas.hora, Citas.citaid)
+
+def history_key(visit):
+    return (visit.fecha, visit.hora, visit.citaid)
+
+# Consulta de una página del historial de una mascota. "before" es la clave
+# de la última visita ya mostrada (None para la primera página). La página de
+# citas se recorta primero con el índice y recién después se cruzan sus
+# tratamientos, así el LIMIT cuenta visitas y no filas del cruce.
+def history_select(mascotaid, before=None, limit=HISTORY_PAGE_SIZE):
+    return history_statement(before is not None).params(history_params(mascotaid, before, limit))
+
+# La misma consulta con mascota, clave y límite como parámetros (history_params):
+# se arma una sola vez y cada página solo la ejecuta
+@lru_cache(maxsize=None)
+def history_statement(paged=False):
+    page = select(Citas.citaid, Citas.fecha, Citas.hora, Citas.duracion, Citas.veterinarioid, Citas.descripcion).where(
+        Citas.mascotaid == bindparam('mascotaid', type_=Integer))
+    if paged:
+        before = [bindparam(f'antes_{column.key}', type_=column.type) for column in HISTORY_ORDER]
+        page = page.where(tuple_(*HISTORY_ORDER) < tuple_(*before))
+    page = page.order_by(*(column.desc() for column in HISTORY_ORDER)).limit(bindparam('limite', type_=Integer)).subquery('visitas')
+    return (
+        select(page, TratamientosPorCita.tratamientoid, Tratamientos.nombre, TratamientosPorCita.dosis,
+               TratamientosPorCita.duracion.label('duracion_tratamiento'))
+        .outerjoin(TratamientosPorCita, TratamientosPorCita.citaid == page.c.citaid)
+        .outerjoin(Tratamientos, Tratamientos.tratamientoid == TratamientosPorCita.tratamientoid)
+        .order_by(page.c.fecha.desc(), page.c.hora.desc(), page.c.citaid.desc(), Tratamientos.nombre)
+    )
+
+def history_params(mascotaid, before=None, limit=HISTORY_PAGE_SIZE):
+    params = {'mascotaid': mascotaid, 'limite': limit}
+    if before is not None:
+        params.update((f'antes_{column.key}', value) for column, value in zip(HISTORY_ORDER, before))
+    return params
+
+# Función para leer una página del historial con los tratamientos de cada visita
+def pet_history(conn, mascotaid, before=None, limit=HISTORY_PAGE_SIZE):
+    visits = []
+    for row in conn.execute(history_statement(before is not None), history_params(mascotaid, before, limit)):
+        if not visits or visits[-1].citaid != row.citaid:
+            visits.append(Visit(row.citaid, row.fecha, row.hora, row.duracion, row.veterinarioid, row.descripcion, []))
+        if row.tratamientoid is not None:
+            visits[-1].tratamientos.append(Treatment(row.tratamientoid, row.nombre, row.dosis, row.duracion_tratamiento))
+    return visits
+
+# Función para recorrer el historial completo en orden, página por página
+def iter_pet_history(mascotaid, page_size=HISTORY_PAGE_SIZE, bind=None):
+    bind = bind or engine
+    before = None
+    while True:
+        with bind.connect() as conn:
+            visits = pet_history(conn, mascotaid, before, page_size)
+        yield from visits
+        if len(visits) < page_size:
+            return
+        before = history_key(visits[-1])
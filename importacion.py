@@ -0,0 +1,268 @@
+import re
+import csv
+import sys
+import argparse
+from datetime import date
+
+from sqlalchemy import select, insert
+
+from base import engine, Clientes, Mascotas
+from configuracion import get_setting
+
+# Carga masiva de clientes y mascotas desde CSV.
+#
+#   python importacion.py clientes clientes.csv --rechazos clientes_rechazados.csv
+#   python importacion.py mascotas mascotas.csv
+#
+# En PostgreSQL el archivo se copia con COPY a una tabla temporal y desde ahí se
+# valida e inserta con SQL (sin recorrer las filas en Python). En otras bases se
+# usan inserciones por lotes.
+
+IMPORT_BATCH_SIZE = get_setting("IMPORT_BATCH_SIZE", 5000, int)
+
+# Columnas aceptadas en cada archivo. Las mascotas indican el dueño con
+# "clienteid" o con "cliente_email" (útil al migrar desde otro sistema).
+IMPORT_COLUMNS = {
+    'clientes': ('nombre', 'apellido', 'direccion', 'telefono', 'email'),
+    'mascotas': ('nombre', 'especie', 'raza', 'fechanacimiento', 'clienteid', 'cliente_email'),
+}
+
+# Largo máximo de cada columna de texto según el modelo
+MAX_LENGTHS = {
+    'clientes': {name: Clientes.__table__.c[name].type.length for name in IMPORT_COLUMNS['clientes']},
+    'mascotas': {name: Mascotas.__table__.c[name].type.length for name in ('nombre', 'especie', 'raza')},
+}
+
+DATE_PATTERN = r'^[0-9]{4}-(0[1-9]|1[0-2])-(0[1-9]|[12][0-9]|3[01])$'
+
+# Función para convertir una fecha AAAA-MM-DD del archivo; None si no es una fecha
+# real (por ejemplo 2023-02-30)
+def parse_birthdate(text):
+    if not re.match(DATE_PATTERN, text):
+        return None
+    try:
+        return date.fromisoformat(text)
+    except ValueError:
+        return None
+
+# Función para leer y validar el encabezado del CSV
+def read_header(path, kind):
+    with open(path, newline='', encoding='utf-8-sig') as f:
+        header = [name.strip().lower() for name in next(csv.reader(f))]
+    unknown = [name for name in header if name not in IMPORT_COLUMNS[kind]]
+    if unknown:
+        raise ValueError(f"Columnas desconocidas en {path}: {', '.join(unknown)}")
+    if 'nombre' not in header:
+        raise ValueError(f"El archivo {path} debe tener la columna 'nombre'")
+    if kind == 'mascotas' and 'clienteid' not in header and 'cliente_email' not in header:
+        raise ValueError(f"El archivo {path} debe tener la columna 'clienteid' o 'cliente_email'")
+    return header
+
+# Función para importar un archivo; devuelve (insertadas, [(línea, motivo), ...])
+def import_csv(kind, path, bind=None, batch_size=IMPORT_BATCH_SIZE):
+    bind = bind or engine
+    header = read_header(path, kind)
+    if bind.dialect.name == 'postgresql':
+        return _import_copy(kind, path, header, bind)
+    return _import_batches(kind, path, header, bind, batch_size)
+
+# --- PostgreSQL: COPY a una tabla temporal y validación en SQL -----------------
+
+def _length_checks(kind):
+    return " OR ".join(f"length(s.{name}) > {length}" for name, length in MAX_LENGTHS[kind].items())
+
+# Condición de fecha inválida que nunca falla: el formato se revisa con la expresión
+# regular y el día contra el último del mes, así el ::date del INSERT solo ve
+# fechas reales y una fecha como 2023-02-30 se rechaza en vez de abortar el COPY.
+# El CASE interno asegura que las conversiones se evalúen solo con formato válido.
+def _invalid_date(column):
+    return f"""{column} IS NOT NULL AND CASE
+                    WHEN {column} !~ '{DATE_PATTERN}' OR substr({column}, 1, 4) = '0000' THEN true
+                    ELSE substr({column}, 9, 2)::integer > extract(day from
+                         (substr({column}, 1, 8) || '01')::date + interval '1 month' - interval '1 day')
+                END"""
+
+# Motivos de rechazo, en orden de prioridad, para cada tipo de archivo
+def _reject_reasons(kind):
+    if kind == 'clientes':
+        return f"""
+            CASE
+                WHEN coalesce(trim(s.nombre), '') = '' THEN 'nombre vacío'
+                WHEN {_length_checks(kind)} THEN 'campo demasiado largo'
+                WHEN s.email IS NOT NULL AND EXISTS (SELECT 1 FROM clientes c WHERE c.email = s.email) THEN 'email ya registrado'
+                WHEN s.email IS NOT NULL AND s.linea <> min(s.linea) FILTER (
+                    WHERE coalesce(trim(s.nombre), '') <> '' AND NOT coalesce({_length_checks(kind)}, false)
+                ) OVER (PARTITION BY s.email) THEN 'email repetido en el archivo'
+            END"""
+    return f"""
+            CASE
+                WHEN coalesce(trim(s.nombre), '') = '' THEN 'nombre vacío'
+                WHEN {_length_checks(kind)} THEN 'campo demasiado largo'
+                WHEN {_invalid_date('s.fechanacimiento')} THEN 'fecha de nacimiento inválida'
+                WHEN s.dueno IS NULL THEN 'dueño no encontrado'
+            END"""
+
+def _copy_into(cursor, sql, path):
+    with open(path, 'rb') as f:
+        if hasattr(cursor, 'copy_expert'):
+            # psycopg2
+            cursor.copy_expert(sql, f)
+        else:
+            # psycopg 3
+            with cursor.copy(sql) as copy:
+                while data := f.read(1 << 16):
+                    copy.write(data)
+
+def _import_copy(kind, path, header, bind):
+    staging = f"importacion_{kind}"
+    columns = IMPORT_COLUMNS[kind]
+    with bind.begin() as conn:
+        column_ddl = ", ".join(f"{name} text" for name in columns)
+        conn.exec_driver_sql(f"CREATE TEMP TABLE {staging} (linea bigserial, {column_ddl}, dueno integer) ON COMMIT DROP")
+        cursor = conn.connection.cursor()
+        _copy_into(cursor, f"COPY {staging} ({', '.join(header)}) FROM STDIN WITH (FORMAT csv, HEADER true)", path)
+        cursor.close()
+
+        # Texto vacío en el CSV se guarda como NULL
+        conn.exec_driver_sql(f"UPDATE {staging} SET " + ", ".join(f"{name} = nullif(trim({name}), '')" for name in columns))
+        if kind == 'mascotas':
+            conn.exec_driver_sql(f"""
+                UPDATE {staging} s SET dueno = c.clienteid FROM clientes c
+                WHERE c.clienteid = CASE WHEN s.clienteid ~ '^[0-9]{{1,9}}$' THEN s.clienteid::integer END""")
+            conn.exec_driver_sql(f"""
+                UPDATE {staging} s SET dueno = c.clienteid FROM clientes c
+                WHERE s.dueno IS NULL AND s.cliente_email IS NOT NULL AND c.email = s.cliente_email""")
+
+        conn.exec_driver_sql(f"""
+            CREATE TEMP TABLE {staging}_rechazos ON COMMIT DROP AS
+            SELECT linea, motivo FROM (SELECT s.linea, {_reject_reasons(kind)} AS motivo FROM {staging} s) r
+            WHERE motivo IS NOT NULL""")
+
+        if kind == 'clientes':
+            target = "clientes (nombre, apellido, direccion, telefono, email)"
+            source = "s.nombre, s.apellido, s.direccion, s.telefono, s.email"
+        else:
+            target = "mascotas (nombre, especie, raza, fechanacimiento, clienteid)"
+            source = "s.nombre, s.especie, s.raza, s.fechanacimiento::date, s.dueno"
+        inserted = conn.exec_driver_sql(f"""
+            INSERT INTO {target}
+            SELECT {source} FROM {staging} s
+            WHERE NOT EXISTS (SELECT 1 FROM {staging}_rechazos r WHERE r.linea = s.linea)
+            ORDER BY s.linea""").rowcount
+        # La línea 1 del archivo es el encabezado
+        rejected = [(linea + 1, motivo) for linea, motivo in
+                    conn.exec_driver_sql(f"SELECT linea, motivo FROM {staging}_rechazos ORDER BY linea")]
+    return inserted, rejected
+
+# --- Otras bases: validación en Python e inserción por lotes ------------------
+
+def _clean(row, header):
+    return {name: value.strip() or None for name, value in zip(header, row)}
+
+def _too_long(kind, values):
+    return any(values.get(name) and len(values[name]) > length for name, length in MAX_LENGTHS[kind].items())
+
+def _validate_clients(conn, batch, seen_emails):
+    emails = [values['email'] for _, values in batch if values.get('email')]
+    existing = set(conn.execute(select(Clientes.email).where(Clientes.email.in_(emails))).scalars()) if emails else set()
+    accepted, rejected = [], []
+    for line, values in batch:
+        email = values.get('email')
+        if not values.get('nombre'):
+            rejected.append((line, 'nombre vacío'))
+        elif _too_long('clientes', values):
+            rejected.append((line, 'campo demasiado largo'))
+        elif email and email in existing:
+            rejected.append((line, 'email ya registrado'))
+        elif email and email in seen_emails:
+            rejected.append((line, 'email repetido en el archivo'))
+        else:
+            if email:
+                seen_emails.add(email)
+            accepted.append({name: values.get(name) for name in IMPORT_COLUMNS['clientes']})
+    return accepted, rejected
+
+def _validate_pets(conn, batch):
+    ids = {int(values['clienteid']) for _, values in batch if (values.get('clienteid') or '').isdigit()}
+    emails = {values['cliente_email'] for _, values in batch if values.get('cliente_email')}
+    known_ids = set(conn.execute(select(Clientes.clienteid).where(Clientes.clienteid.in_(ids))).scalars()) if ids else set()
+    by_email = dict(conn.execute(select(Clientes.email, Clientes.clienteid).where(Clientes.email.in_(emails))).all()) if emails else {}
+    accepted, rejected = [], []
+    for line, values in batch:
+        owner = None
+        if (values.get('clienteid') or '').isdigit() and int(values['clienteid']) in known_ids:
+            owner = int(values['clienteid'])
+        elif values.get('cliente_email') in by_email:
+            owner = by_email[values['cliente_email']]
+        text = values.get('fechanacimiento')
+        birthdate = parse_birthdate(text) if text else None
+        if not values.get('nombre'):
+            rejected.append((line, 'nombre vacío'))
+        elif _too_long('mascotas', values):
+            rejected.append((line, 'campo demasiado largo'))
+        elif text and birthdate is None:
+            rejected.append((line, 'fecha de nacimiento inválida'))
+        elif owner is None:
+            rejected.append((line, 'dueño no encontrado'))
+        else:
+            accepted.append({'nombre': values['nombre'], 'especie': values.get('especie'), 'raza': values.get('raza'),
+                             'fechanacimiento': birthdate, 'clienteid': owner})
+    return accepted, rejected
+
+def _import_batches(kind, path, header, bind, batch_size):
+    model = Clientes if kind == 'clientes' else Mascotas
+    inserted, rejected = 0, []
+    seen_emails = set()
+
+    def flush(conn, batch):
+        if kind == 'clientes':
+            accepted, batch_rejected = _validate_clients(conn, batch, seen_emails)
+        else:
+            accepted, batch_rejected = _validate_pets(conn, batch)
+        if accepted:
+            conn.execute(insert(model), accepted)
+        rejected.extend(batch_rejected)
+        return len(accepted)
+
+    with bind.begin() as conn, open(path, newline='', encoding='utf-8-sig') as f:
+        reader = csv.reader(f)
+        next(reader)
+        batch = []
+        for row in reader:
+            batch.append((reader.line_num, _clean(row, header)))
+            if len(batch) >= batch_size:
+                inserted += flush(conn, batch)
+                batch = []
+        if batch:
+            inserted += flush(conn, batch)
+    return inserted, rejected
+
+# Función para guardar el informe de filas rechazadas
+def write_rejections(path, rejected):
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow(('linea', 'motivo'))
+        writer.writerows(rejected)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Importación masiva de clientes y mascotas desde CSV")
+    parser.add_argument("tipo", choices=sorted(IMPORT_COLUMNS))
+    parser.add_argument("archivo")
+    parser.add_argument("--rechazos", help="Archivo CSV donde guardar las filas rechazadas")
+    parser.add_argument("--lote", type=int, default=IMPORT_BATCH_SIZE, help="Filas por lote cuando no se usa COPY")
+    args = parser.parse_args()
+    try:
+        inserted, rejected = import_csv(args.tipo, args.archivo, batch_size=args.lote)
+    except ValueError as e:
+        print(f"Error: {e}")
+        sys.exit(1)
+    print(f"{inserted} filas importadas en {args.tipo}, {len(rejected)} rechazadas")
+    if rejected:
+        if args.rechazos:
+            write_rejections(args.rechazos, rejected)
+            print(f"Detalle de rechazos en {args.rechazos}")
+        else:
+            for line, reason in rejected[:20]:
+                print(f"  línea {line}: {reason}")
+            if len(rejected) > 20:
+                print(f"  ... y {len(rejected) - 20} más (use --rechazos para el detalle completo)")
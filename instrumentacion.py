@@ -0,0 +1,244 @@
+import re
+import csv
+import json
+import time
+import threading
+from bisect import bisect_left
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime
+
+from sqlalchemy import event
+
+from configuracion import get_setting
+
+# Estadísticas de SQL por forma de sentencia. Con SQL_STATS apagado no se conecta
+# ningún evento al motor: no hay costo alguno. Se puede activar en marcha desde el
+# panel de diagnóstico (diagnostico.py) o con sql_stats.attach(motor).
+SQL_STATS = get_setting("SQL_STATS", False, bool)
+
+# Sentencias que tardan al menos este tiempo van al registro de lentas; si se
+# indica SQL_SLOW_LOG también se agregan a ese archivo (una línea por sentencia)
+SQL_SLOW_MS = get_setting("SQL_SLOW_MS", 200, float)
+SQL_SLOW_LOG = get_setting("SQL_SLOW_LOG", None)
+SQL_SLOW_LOG_SIZE = get_setting("SQL_SLOW_LOG_SIZE", 200, int)
+
+# Formas de sentencia distintas que se guardan; las que sobran se juntan en una
+SQL_MAX_SHAPES = get_setting("SQL_MAX_SHAPES", 500, int)
+OTHER_SHAPE = "(otras sentencias)"
+
+# Límites superiores (ms) de los tramos del histograma de latencia; el último
+# tramo junta todo lo que supera al mayor
+HISTOGRAM_BOUNDS_MS = (0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+
+# Forma de una sentencia: los parámetros ya van aparte, pero las listas de IN y
+# los INSERT de varias filas cambian de largo según la cantidad de valores
+_PLACEHOLDER = re.compile(r"%\(\w+\)s|\$\d+|\?")
+_PLACEHOLDER_LIST = re.compile(r"\?(?:\s*,\s*\?)+|(?<=IN \()\?(?=\))")
+_REPEATED_ROWS = re.compile(r"(\([^()]*\))(?:\s*,\s*\1)+")
+_SPACES = re.compile(r"\s+")
+
+def statement_shape(statement):
+    shape = _PLACEHOLDER.sub("?", statement)
+    shape = _PLACEHOLDER_LIST.sub("?, ...", shape)
+    shape = _REPEATED_ROWS.sub(r"\1, ...", shape)
+    return _SPACES.sub(" ", shape).strip()
+
+# Acción en curso (por hilo o por tarea de asyncio): [nombre, sentencias, segundos en la base]
+_current_action = ContextVar('sql_action', default=None)
+
+# Percentil aproximado a partir del histograma (límite superior del tramo)
+def _histogram_percentile(buckets, count, fraction, maximum):
+    if not count:
+        return 0.0
+    wanted = count * fraction
+    seen = 0
+    for bound, hits in zip(HISTOGRAM_BOUNDS_MS, buckets):
+        seen += hits
+        if seen >= wanted:
+            return min(bound, maximum)
+    return maximum
+
+# Registro de sentencias ejecutadas por los motores conectados: por cada forma de
+# sentencia cantidad, tiempo total y máximo, filas (cursor.rowcount, cuando el
+# driver lo informa) e histograma de latencia; por cada acción de la interfaz o
+# petición HTTP, cuántos viajes a la base hizo; y las sentencias lentas. Los
+# eventos llegan desde varios hilos, por eso lo compartido va con un lock.
+class SqlStats:
+    def __init__(self, slow_ms=SQL_SLOW_MS, slow_log=SQL_SLOW_LOG, max_shapes=SQL_MAX_SHAPES):
+        self.slow_ms = slow_ms
+        self.slow_log = slow_log
+        self.max_shapes = max_shapes
+        self._engines = []
+        self._lock = threading.Lock()
+        self._shape_cache = {}
+        self.reset()
+
+    @property
+    def enabled(self):
+        return bool(self._engines)
+
+    # Conectar los eventos al motor (a un motor asíncrono se le conecta su sync_engine)
+    def attach(self, engine):
+        engine = getattr(engine, 'sync_engine', engine)
+        if engine not in self._engines:
+            event.listen(engine, 'before_cursor_execute', self._before)
+            event.listen(engine, 'after_cursor_execute', self._after)
+            self._engines.append(engine)
+
+    # Desconectar los eventos de un motor (o de todos)
+    def detach(self, engine=None):
+        engines = list(self._engines) if engine is None else [getattr(engine, 'sync_engine', engine)]
+        for engine in engines:
+            if engine in self._engines:
+                event.remove(engine, 'before_cursor_execute', self._before)
+                event.remove(engine, 'after_cursor_execute', self._after)
+                self._engines.remove(engine)
+
+    def reset(self):
+        with self._lock:
+            self._shapes = {}
+            self._actions = {}
+            self._slow = deque(maxlen=SQL_SLOW_LOG_SIZE)
+            self.started = datetime.now()
+
+    def _before(self, conn, cursor, statement, parameters, context, executemany):
+        context._sql_started = time.perf_counter()
+
+    def _after(self, conn, cursor, statement, parameters, context, executemany):
+        # Si el registro se activó con la sentencia ya en curso no hay inicio: se omite
+        started = getattr(context, '_sql_started', None)
+        if started is None:
+            return
+        elapsed = time.perf_counter() - started
+        shape = self._shape_cache.get(statement)
+        if shape is None:
+            shape = statement_shape(statement)
+            if len(self._shape_cache) < self.max_shapes * 4:
+                self._shape_cache[statement] = shape
+        rows = cursor.rowcount if cursor is not None else -1
+        ms = elapsed * 1000
+        with self._lock:
+            entry = self._shapes.get(shape)
+            if entry is None:
+                if len(self._shapes) >= self.max_shapes:
+                    shape = OTHER_SHAPE
+                entry = self._shapes.setdefault(shape, [0, 0.0, 0.0, 0, [0] * (len(HISTOGRAM_BOUNDS_MS) + 1)])
+            entry[0] += 1
+            entry[1] += elapsed
+            entry[2] = max(entry[2], elapsed)
+            if rows > 0:
+                entry[3] += rows
+            entry[4][bisect_left(HISTOGRAM_BOUNDS_MS, ms)] += 1
+        current = _current_action.get()
+        if current is not None:
+            current[1] += 1
+            current[2] += elapsed
+        if ms >= self.slow_ms:
+            self._log_slow(statement, ms, rows, current[0] if current is not None else None)
+
+    def _log_slow(self, statement, ms, rows, action):
+        entry = {
+            'fecha': datetime.now().isoformat(timespec='seconds'),
+            'ms': round(ms, 2),
+            'filas': rows if rows >= 0 else None,
+            'accion': action,
+            'sql': _SPACES.sub(" ", statement).strip(),
+        }
+        with self._lock:
+            self._slow.append(entry)
+        if self.slow_log:
+            with open(self.slow_log, "a", encoding="utf-8") as f:
+                f.write(f"{entry['fecha']}\t{entry['ms']:.1f} ms\t{entry['accion'] or '-'}\t{entry['sql']}\n")
+
+    # Agrupar las sentencias que se ejecutan dentro del bloque bajo "name" (una
+    # acción de la interfaz o una petición). Apagado no registra nada.
+    @contextmanager
+    def action(self, name):
+        if not self._engines:
+            yield
+            return
+        current = [name, 0, 0.0]
+        token = _current_action.set(current)
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            _current_action.reset(token)
+            elapsed = time.perf_counter() - started
+            with self._lock:
+                entry = self._actions.setdefault(name, [0, 0, 0, 0.0, 0.0])
+                entry[0] += 1
+                entry[1] += current[1]
+                entry[2] = max(entry[2], current[1])
+                entry[3] += current[2]
+                entry[4] += elapsed
+
+    # Ejecutar fn(*args) como una acción (para los hilos del DBWorker)
+    def run(self, name, fn, *args):
+        with self.action(name):
+            return fn(*args)
+
+    # Formas de sentencia, de la que más tiempo consumió a la que menos
+    def statements(self):
+        with self._lock:
+            items = [(shape, entry[0], entry[1], entry[2], entry[3], list(entry[4])) for shape, entry in self._shapes.items()]
+        result = []
+        for shape, count, total, maximum, rows, buckets in items:
+            maximum_ms = maximum * 1000
+            result.append({
+                'sql': shape,
+                'veces': count,
+                'total_ms': total * 1000,
+                'media_ms': total * 1000 / count,
+                'p50_ms': _histogram_percentile(buckets, count, 0.50, maximum_ms),
+                'p99_ms': _histogram_percentile(buckets, count, 0.99, maximum_ms),
+                'max_ms': maximum_ms,
+                'filas': rows,
+                'histograma': dict(zip([f"<={bound}" for bound in HISTOGRAM_BOUNDS_MS] + [f">{HISTOGRAM_BOUNDS_MS[-1]}"], buckets)),
+            })
+        return sorted(result, key=lambda item: item['total_ms'], reverse=True)
+
+    # Viajes a la base por acción
+    def actions(self):
+        with self._lock:
+            items = [(name, list(entry)) for name, entry in self._actions.items()]
+        return sorted(({
+            'accion': name,
+            'veces': count,
+            'sentencias_por_vez': statements / count,
+            'max_sentencias': maximum,
+            'ms_base_por_vez': db_seconds * 1000 / count,
+            'ms_por_vez': seconds * 1000 / count,
+        } for name, (count, statements, maximum, db_seconds, seconds) in items if count), key=lambda item: item['accion'])
+
+    def slow_queries(self):
+        with self._lock:
+            return list(self._slow)
+
+    def snapshot(self):
+        return {
+            'desde': self.started.isoformat(timespec='seconds'),
+            'activo': self.enabled,
+            'umbral_lento_ms': self.slow_ms,
+            'sentencias': self.statements(),
+            'acciones': self.actions(),
+            'lentas': self.slow_queries(),
+        }
+
+    # Exportar a JSON (todo) o a CSV (solo la tabla de sentencias) según la extensión
+    def export(self, path):
+        if path.lower().endswith(".csv"):
+            columns = ('sql', 'veces', 'total_ms', 'media_ms', 'p50_ms', 'p99_ms', 'max_ms', 'filas')
+            with open(path, "w", newline="", encoding="utf-8") as f:
+                writer = csv.writer(f)
+                writer.writerow(columns)
+                for item in self.statements():
+                    writer.writerow([item[column] for column in columns])
+        else:
+            with open(path, "w", encoding="utf-8") as f:
+                json.dump(self.snapshot(), f, indent=2, ensure_ascii=False)
+
+# Registro compartido por toda la aplicación
+sql_stats = SqlStats()
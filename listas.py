@@ -0,0 +1,184 @@
+import tkinter as tk
+
+from consultas import PAGE_SIZE
+from configuracion import get_setting
+
+# Espera después de la última tecla antes de buscar
+SEARCH_DELAY_MS = get_setting("SEARCH_DELAY_MS", 300, int)
+
+# Carga una Treeview por páginas: la siguiente página se pide cuando el usuario
+# se acerca al final de la lista al desplazarse. Cada fila usa su clave primaria
+# como iid, así las altas y bajas solo tocan la fila afectada. Las páginas se
+# piden al DBWorker, por lo que la ventana sigue respondiendo mientras cargan.
+class TreePaginator:
+    def __init__(self, tree, scrollbar, worker, load_page, to_values, to_key, page_size=PAGE_SIZE, threshold=0.9, on_error=None):
+        self.tree = tree
+        self.worker = worker
+        self.scrollbar = scrollbar
+        self.load_page = load_page
+        self.to_values = to_values
+        self.to_key = to_key
+        self.page_size = page_size
+        self.threshold = threshold
+        self.on_error = on_error
+        self.after = None
+        self.exhausted = False
+        self._loading = False
+        self.tree.configure(yscrollcommand=self._on_scroll)
+
+    # Vaciar la lista y volver a cargar desde la primera página; una carga
+    # anterior que siga en curso queda descartada
+    def reset(self):
+        self.tree.delete(*self.tree.get_children())
+        self.after = None
+        self.exhausted = False
+        self._loading = False
+        self.load_more()
+
+    # Mostrar un conjunto fijo de filas (resultados de búsqueda) en lugar de las
+    # páginas; reset() vuelve a la lista completa
+    def show_rows(self, rows):
+        self.worker.cancel(self)
+        self.tree.delete(*self.tree.get_children())
+        self.after = None
+        self.exhausted = True
+        self._loading = False
+        for row in rows:
+            self.tree.insert('', 'end', iid=self.row_id(row), values=self.to_values(row))
+
+    # Pedir la siguiente página (si todavía quedan filas y no hay otra en camino)
+    def load_more(self):
+        if self.exhausted or self._loading:
+            return
+        self._loading = True
+        self.worker.submit(self.load_page, self.after, self.page_size,
+                           on_done=self._append_page, on_error=self._page_failed, key=self)
+
+    def _append_page(self, rows):
+        self._loading = False
+        for row in rows:
+            # Puede que ya esté en la lista si se agregó desde este puesto
+            if not self.tree.exists(self.row_id(row)):
+                self.tree.insert('', 'end', iid=self.row_id(row), values=self.to_values(row))
+        if rows:
+            self.after = self.to_key(rows[-1])
+        self.exhausted = len(rows) < self.page_size
+
+    def _page_failed(self, error):
+        self._loading = False
+        if self.on_error is not None:
+            self.on_error(error)
+
+    # La clave primaria es el último elemento de la clave de orden
+    def row_id(self, row):
+        return str(self.to_key(row)[-1])
+
+    # Mostrar una fila recién agregada (o actualizarla si ya estaba)
+    def add_row(self, row):
+        iid = self.row_id(row)
+        if self.tree.exists(iid):
+            self.tree.item(iid, values=self.to_values(row))
+        else:
+            self.tree.insert('', 'end', iid=iid, values=self.to_values(row))
+        self.tree.see(iid)
+
+    # Quitar de la lista la fila con esa clave primaria
+    def remove_row(self, key):
+        iid = str(key)
+        if self.tree.exists(iid):
+            self.tree.delete(iid)
+
+    def _on_scroll(self, first, last):
+        self.scrollbar.set(first, last)
+        if not self.exhausted and not self._loading and float(last) >= self.threshold:
+            self.load_more()
+
+
+# Llama a on_search(texto) cuando el usuario deja de escribir en el Entry por
+# delay_ms milisegundos (evita una consulta por cada tecla)
+class DebouncedSearch:
+    def __init__(self, entry, on_search, delay_ms=SEARCH_DELAY_MS):
+        self.entry = entry
+        self.on_search = on_search
+        self.delay_ms = delay_ms
+        self._scheduled = None
+        self.entry.bind('<KeyRelease>', self._on_key, add='+')
+
+    def _on_key(self, event=None):
+        # Las teclas de navegación no cambian el texto
+        if event is not None and event.keysym in ('Down', 'Up', 'Escape', 'Return'):
+            return
+        if self._scheduled is not None:
+            self.entry.after_cancel(self._scheduled)
+        self._scheduled = self.entry.after(self.delay_ms, self._fire)
+
+    def _fire(self):
+        self._scheduled = None
+        self.on_search(self.entry.get())
+
+# Lista de sugerencias bajo un Entry, alimentada por un índice en memoria
+# (autocompletar.PrefixIndex). "get_index" devuelve el índice actual o None si
+# todavía no se cargó; al elegir una sugerencia se llama on_select(id).
+class Autocomplete:
+    def __init__(self, entry, get_index, on_select, limit=8):
+        self.entry = entry
+        self.get_index = get_index
+        self.on_select = on_select
+        self.limit = limit
+        self._keys = []
+        self.listbox = tk.Listbox(entry.winfo_toplevel(), height=limit, activestyle='dotbox')
+        self.listbox.bind('<Double-Button-1>', self._choose)
+        self.listbox.bind('<Return>', self._choose)
+        self.listbox.bind('<Escape>', lambda event: self.hide())
+        self.entry.bind('<KeyRelease>', self._on_key, add='+')
+        self.entry.bind('<Down>', self._focus_list, add='+')
+        self.entry.bind('<Escape>', lambda event: self.hide(), add='+')
+        self.entry.bind('<FocusOut>', self._on_focus_out, add='+')
+
+    def _on_key(self, event):
+        if event.keysym in ('Down', 'Up', 'Escape', 'Return'):
+            return
+        index = self.get_index()
+        text = self.entry.get()
+        matches = index.search(text, self.limit) if index is not None and text.strip() else []
+        if not matches:
+            self.hide()
+            return
+        self._keys = [key for key, _ in matches]
+        self.listbox.delete(0, 'end')
+        for _, label in matches:
+            self.listbox.insert('end', label)
+        self.listbox.configure(height=len(matches))
+        top = self.entry.winfo_toplevel()
+        self.listbox.place(x=self.entry.winfo_rootx() - top.winfo_rootx(),
+                           y=self.entry.winfo_rooty() - top.winfo_rooty() + self.entry.winfo_height(),
+                           width=self.entry.winfo_width())
+        self.listbox.lift()
+
+    def _focus_list(self, event):
+        if self.listbox.winfo_ismapped():
+            self.listbox.focus_set()
+            self.listbox.selection_clear(0, 'end')
+            self.listbox.selection_set(0)
+            self.listbox.activate(0)
+
+    def _on_focus_out(self, event):
+        # Se espera un momento por si el foco pasó a la lista de sugerencias
+        self.entry.after(150, self._hide_if_unfocused)
+
+    def _hide_if_unfocused(self):
+        if self.entry.focus_get() is not self.listbox:
+            self.hide()
+
+    def _choose(self, event=None):
+        selection = self.listbox.curselection()
+        if selection:
+            key = self._keys[selection[0]]
+            self.entry.delete(0, 'end')
+            self.entry.insert(0, self.listbox.get(selection[0]))
+            self.hide()
+            self.entry.focus_set()
+            self.on_select(key)
+
+    def hide(self):
+        self.listbox.place_forget()
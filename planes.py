@@ -0,0 +1,95 @@
+import sys
+import json
+import argparse
+from datetime import timedelta
+
+from sqlalchemy import select
+
+from base import AuditoriaCitas, Citas, DetalleVenta, Mascotas, TratamientosPorCita, Ventas
+from historial import history_select
+from datos_sinteticos import START_DATE, parse_scale, default_url, bench_engine, prepare
+
+# Verifica que las consultas frecuentes usen índices: se obtiene el plan (EXPLAIN)
+# de cada una sobre un volumen grande de datos y falla si alguna recorre completa
+# una de las tablas grandes. Los datos salen de datos_sinteticos.py.
+#
+#   python planes.py                                  (SQLite temporal, 100k citas)
+#   python planes.py --url postgresql://... --escala 1m
+
+FIRST_DATE = START_DATE
+
+# Consultas frecuentes: (nombre, tablas que no se deben recorrer completas, consulta)
+HOT_QUERIES = [
+    ("citas por veterinario y día", ('citas',),
+     lambda: select(Citas).where(Citas.veterinarioid == 1, Citas.fecha == FIRST_DATE).order_by(Citas.hora)),
+    ("agenda de varios días (horarios libres)", ('citas',),
+     lambda: select(Citas.fecha, Citas.hora, Citas.duracion, Citas.veterinarioid).where(
+         Citas.veterinarioid.in_([1, 2, 3]), Citas.fecha.between(FIRST_DATE, FIRST_DATE + timedelta(days=30)))),
+    ("agenda del día de la clínica", ('citas',),
+     lambda: select(Citas).where(Citas.fecha == FIRST_DATE).order_by(Citas.hora)),
+    ("historial de una mascota", ('citas', 'tratamientosporcita'),
+     lambda: history_select(1)),
+    ("mascotas de un cliente", ('mascotas',),
+     lambda: select(Mascotas).where(Mascotas.clienteid == 1)),
+    ("compras de un cliente", ('ventas',),
+     lambda: select(Ventas).where(Ventas.clienteid == 1, Ventas.clienteid.is_not(None)).order_by(Ventas.fecha.desc()).limit(50)),
+    ("ventas de un período", ('ventas',),
+     lambda: select(Ventas).where(Ventas.fecha.between(FIRST_DATE, FIRST_DATE + timedelta(days=7)))),
+    ("líneas de una venta", ('detalleventa',),
+     lambda: select(DetalleVenta).where(DetalleVenta.ventaid == 1)),
+    ("ventas de un producto", ('detalleventa',),
+     lambda: select(DetalleVenta.ventaid, DetalleVenta.cantidad).where(DetalleVenta.productoid == 1)),
+    ("citas con un tratamiento", ('tratamientosporcita',),
+     lambda: select(TratamientosPorCita.citaid).where(TratamientosPorCita.tratamientoid == 1)),
+    ("auditoría de una cita", ('auditoriacitas',),
+     lambda: select(AuditoriaCitas).where(AuditoriaCitas.citaid == 1).order_by(AuditoriaCitas.fecharegistro)),
+]
+
+# Función para obtener las tablas que el plan recorre completas
+def sequential_scans(conn, stmt):
+    sql = str(stmt.compile(dialect=conn.dialect, compile_kwargs={'literal_binds': True}))
+    if conn.dialect.name == 'postgresql':
+        plan = conn.exec_driver_sql("EXPLAIN (FORMAT JSON) " + sql).scalar()
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        scanned, pending = [], [plan[0]['Plan']]
+        while pending:
+            node = pending.pop()
+            if node.get('Node Type') == 'Seq Scan':
+                scanned.append(node.get('Relation Name'))
+            pending.extend(node.get('Plans', ()))
+        return scanned, json.dumps(plan, indent=1)
+    rows = conn.exec_driver_sql("EXPLAIN QUERY PLAN " + sql).all()
+    details = [row[-1] for row in rows]
+    # SQLite: "SCAN tabla" sin "USING ... INDEX" es un recorrido completo
+    scanned = [detail.split()[1] for detail in details if detail.startswith('SCAN ') and ' USING ' not in detail]
+    return scanned, "\n".join(details)
+
+# Función para revisar todas las consultas; devuelve la lista de las que fallan
+def check_plans(bind, verbose=False):
+    failures = []
+    with bind.connect() as conn:
+        for name, tables, build in HOT_QUERIES:
+            scanned, plan = sequential_scans(conn, build())
+            bad = [table for table in scanned if table in tables]
+            print(f"{'FALLA' if bad else 'ok':<6} {name}" + (f" (recorre {', '.join(bad)})" if bad else ""))
+            if bad or verbose:
+                print("       " + plan.replace("\n", "\n       "))
+            if bad:
+                failures.append(name)
+    return failures
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Verificación de planes de las consultas frecuentes")
+    parser.add_argument("--url", help="Base de datos a usar (por defecto un SQLite temporal por escala)")
+    parser.add_argument("--escala", default="100k", help="Cantidad de citas de los datos de prueba: 10k, 100k, 1m o un número")
+    parser.add_argument("--planes", action="store_true", help="Mostrar todos los planes")
+    args = parser.parse_args()
+
+    plan_engine = bench_engine(args.url or default_url(args.escala))
+    prepare(plan_engine, parse_scale(args.escala))
+    failures = check_plans(plan_engine, args.planes)
+    if failures:
+        print(f"\n{len(failures)} consultas recorren tablas completas")
+        sys.exit(1)
+    print("\nTodas las consultas usan índices")
@@ -0,0 +1,167 @@
+import threading
+import time
+from datetime import timedelta
+
+from sqlalchemy import select, func, literal, union_all
+
+from base import Productos, Tratamientos, Veterinarios
+from configuracion import get_setting
+
+# Segundos entre revisiones de la marca de agua (la revisión es una sola consulta)
+REFERENCE_CHECK_SECONDS = get_setting("REFERENCE_CHECK_SECONDS", 30, int)
+
+# Duración máxima esperada de una transacción que modifica las referencias. La
+# marca es la hora de inicio de la transacción (CURRENT_TIMESTAMP), así que una
+# fila puede confirmarse después de otra con marca mayor; durante este tiempo se
+# releen también las filas con marca hasta este margen anterior a la última vista.
+REFERENCE_OVERLAP_SECONDS = get_setting("REFERENCE_OVERLAP_SECONDS", 300, int)
+
+# Columnas que se guardan de cada tabla de referencia (la primera es la clave)
+REFERENCE_COLUMNS = {
+    Productos: (Productos.productoid, Productos.nombre, Productos.precio),
+    Tratamientos: (Tratamientos.tratamientoid, Tratamientos.nombre),
+    Veterinarios: (Veterinarios.veterinarioid, Veterinarios.nombre, Veterinarios.apellido, Veterinarios.especialidad),
+}
+
+# Texto que se muestra para cada fila (listas desplegables y columnas de nombre)
+def reference_label(model, row):
+    if row is None:
+        return ''
+    if model is Veterinarios:
+        return f"{row.nombre or ''} {row.apellido or ''}".strip()
+    return row.nombre or ''
+
+# Opción de una lista desplegable: "id - nombre"
+def reference_option(model, row):
+    return f"{row[0]} - {reference_label(model, row)}"
+
+# Función para leer el id del comienzo de una opción ("12 - Nombre" o solo "12")
+def leading_id(text):
+    return int(text.strip().split(' ', 1)[0])
+
+# Caché de productos, tratamientos y veterinarios. Cada tabla guarda la mayor
+# marca "actualizado" vista y la cantidad de filas. refresh() compara ambas con
+# la base en una sola consulta y solo relee las filas modificadas desde entonces
+# (con un margen de overlap segundos); si la cantidad no cuadra (hubo bajas)
+# relee esa tabla completa. Después de cada cambio visto, durante overlap
+# segundos se releen las filas del margen aunque la marca y la cantidad no hayan
+# cambiado: así aparecen las transacciones que empezaron antes y confirmaron después.
+# refresh() corre en los hilos de la base de datos; peek()/options() solo leen
+# memoria y se pueden llamar desde el hilo de Tk.
+class ReferenceCache:
+    def __init__(self, check_seconds=REFERENCE_CHECK_SECONDS, overlap=REFERENCE_OVERLAP_SECONDS):
+        self.check_seconds = check_seconds
+        self.overlap = overlap
+        self._rows = {model: {} for model in REFERENCE_COLUMNS}
+        self._watermarks = {model: None for model in REFERENCE_COLUMNS}
+        self._rescan_until = {model: None for model in REFERENCE_COLUMNS}
+        self._checked = None
+        # Aumenta con cada cambio en memoria (quien arma algo con las filas lo
+        # puede guardar y rehacerlo solo cuando cambia)
+        self.version = 0
+        self._lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+        self._refresh_owner = None
+
+    # Revisar la marca de agua (a lo sumo cada check_seconds, salvo force=True)
+    # y traer lo que cambió. Devuelve True si algo cambió. Si otra revisión ya
+    # está en curso no se la espera, alcanza con lo que hay en memoria; salvo en
+    # la primera carga y con force=True, donde quien llama necesita ver las filas
+    # recién creadas. En el servidor asíncrono (servidor.py) todas las peticiones
+    # comparten un hilo: si la revisión en curso es de ese mismo hilo, esperarla
+    # trabaría el bucle, así que se revisa igual sin el lock.
+    def refresh(self, conn, force=False):
+        wait = force or self._checked is None
+        if wait and self._refresh_owner == threading.get_ident():
+            return self._check(conn, force)
+        if not self._refresh_lock.acquire(blocking=wait):
+            return False
+        self._refresh_owner = threading.get_ident()
+        try:
+            return self._check(conn, force)
+        finally:
+            self._refresh_owner = None
+            self._refresh_lock.release()
+
+    def _check(self, conn, force):
+        now = time.monotonic()
+        if not force and self._checked is not None and now - self._checked < self.check_seconds:
+            return False
+        models = list(REFERENCE_COLUMNS)
+        stmt = union_all(*(
+            select(literal(position).label('posicion'), func.max(model.actualizado).label('marca'), func.count().label('filas'))
+            for position, model in enumerate(models)
+        ))
+        changed = False
+        for row in conn.execute(stmt):
+            model = models[row.posicion]
+            if self._load_changes(conn, model, row.marca, row.filas, now):
+                changed = True
+        self._checked = now
+        return changed
+
+    def _load_changes(self, conn, model, marca, filas, now):
+        with self._lock:
+            watermark = self._watermarks[model]
+            rows = self._rows[model]
+            rescan_until = self._rescan_until[model]
+        quiet = watermark == marca and len(rows) == filas
+        if quiet and rescan_until is None:
+            return False
+        key = REFERENCE_COLUMNS[model][0]
+        stmt = select(*REFERENCE_COLUMNS[model], model.actualizado)
+        full = watermark is None or marca is None or (marca == watermark and len(rows) != filas)
+        if not full:
+            stmt = stmt.where(model.actualizado >= watermark - timedelta(seconds=self.overlap))
+        loaded = {row[0]: row for row in conn.execute(stmt.order_by(key))}
+        if not full:
+            loaded = {**rows, **loaded}
+            if len(loaded) != filas:
+                # Hubo bajas: solo una lectura completa sabe cuáles
+                stmt = select(*REFERENCE_COLUMNS[model], model.actualizado).order_by(key)
+                loaded = {row[0]: row for row in conn.execute(stmt)}
+        if not quiet:
+            rescan_until = now + self.overlap
+        elif now >= rescan_until:
+            # Esta relectura ya es posterior al margen: lo anterior quedó confirmado
+            rescan_until = None
+        with self._lock:
+            self._rows[model] = loaded
+            self._watermarks[model] = marca
+            self._rescan_until[model] = rescan_until
+            if loaded != rows:
+                self.version += 1
+        return loaded != rows
+
+    # True si ya toca revisar la marca de agua: si no, refresh() no consulta la
+    # base y quien llama se puede ahorrar la conexión
+    def due(self):
+        return self._checked is None or time.monotonic() - self._checked >= self.check_seconds
+
+    # Fila en memoria por id (None si no está)
+    def peek(self, model, id):
+        with self._lock:
+            return self._rows[model].get(id)
+
+    # Todas las filas de la tabla ordenadas por id
+    def rows(self, model):
+        with self._lock:
+            return sorted(self._rows[model].values(), key=lambda row: row[0])
+
+    # Opciones para una lista desplegable
+    def options(self, model):
+        return [reference_option(model, row) for row in self.rows(model)]
+
+    def label(self, model, id):
+        return reference_label(model, self.peek(model, id))
+
+    # Olvidar todo: la próxima refresh() relee las tres tablas
+    def clear(self):
+        with self._lock:
+            self._rows = {model: {} for model in REFERENCE_COLUMNS}
+            self._watermarks = {model: None for model in REFERENCE_COLUMNS}
+            self._rescan_until = {model: None for model in REFERENCE_COLUMNS}
+            self._checked = None
+            self.version += 1
+
+reference_cache = ReferenceCache()
@@ -0,0 +1,350 @@
+from dataclasses import dataclass, asdict
+from datetime import date, time, timedelta
+from typing import Optional, Tuple
+
+from sqlalchemy import text
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import sessionmaker
+
+from base import engine, SessionLocal, Clientes, Mascotas, Citas, Ventas, TratamientosPorCita, Tratamientos
+from consultas import PAGE_SIZE, fetch_rows, fetch_page, fetch_rows_by_ids, fetch_objects_by_ids, search_rows, insert_returning, delete_returning, LIST_LOADS
+from cache_clientes import client_cache, owner_name
+from referencias import reference_cache, leading_id
+from agenda import insert_appointment, delete_appointments, find_slots, DEFAULT_DURATION
+from ventas import checkout
+from historial import pet_history, HISTORY_PAGE_SIZE
+
+# Días que abarca la búsqueda de horario libre
+SLOT_SEARCH_DAYS = 30
+
+# Lógica de la veterinaria sin interfaz: la usan la ventana de Tk (final.py), los
+# scripts y el benchmark. Las entradas son dataclasses con tipos ya convertidos;
+# from_form() arma cada una a partir del texto de un formulario y lanza
+# ValueError con un mensaje para el usuario si algo no es válido.
+
+# Función para convertir un texto a entero (vacío -> None si se permite)
+def parse_int(value, message, required=True):
+    value = str(value if value is not None else '').strip()
+    if not value and not required:
+        return None
+    try:
+        return int(value)
+    except ValueError:
+        raise ValueError(message) from None
+
+# Función para convertir un texto YYYY-MM-DD a fecha (vacío -> None si se permite)
+def parse_date(value, message="Formato de fecha incorrecto. Use YYYY-MM-DD.", required=True):
+    if isinstance(value, date):
+        return value
+    value = (value or '').strip()
+    if not value and not required:
+        return None
+    try:
+        return date.fromisoformat(value)
+    except ValueError:
+        raise ValueError(message) from None
+
+@dataclass(frozen=True)
+class ClientInput:
+    nombre: str
+    apellido: str = ''
+    direccion: str = ''
+    telefono: str = ''
+    email: str = ''
+
+    @classmethod
+    def from_form(cls, nombre, apellido='', direccion='', telefono='', email=''):
+        return cls(nombre.strip(), apellido.strip(), direccion.strip(), telefono.strip(), email.strip())
+
+    def validate(self):
+        if not self.nombre:
+            raise ValueError("El nombre es obligatorio")
+
+@dataclass(frozen=True)
+class PetInput:
+    nombre: str
+    especie: str
+    clienteid: int
+    raza: str = ''
+    fechanacimiento: Optional[date] = None
+
+    @classmethod
+    def from_form(cls, nombre, especie, raza, fechanacimiento, clienteid):
+        return cls(nombre.strip(), especie.strip(),
+                   parse_int(clienteid, "Cliente ID debe ser un número"),
+                   raza.strip(), parse_date(fechanacimiento, required=False))
+
+    def validate(self):
+        if not self.nombre or not self.especie:
+            raise ValueError("Nombre y especie son obligatorios")
+
+@dataclass(frozen=True)
+class AppointmentInput:
+    fecha: date
+    hora: time
+    mascotaid: int
+    veterinarioid: int
+    descripcion: str = ''
+    duracion: int = DEFAULT_DURATION
+
+    @classmethod
+    def from_form(cls, fecha, hora, duracion, mascotaid, veterinario, descripcion=''):
+        message = "revise fecha (YYYY-MM-DD), hora (HH:MM), duración e IDs"
+        try:
+            return cls(date.fromisoformat(fecha.strip()), time.fromisoformat(hora.strip()),
+                       int(mascotaid), leading_id(veterinario), descripcion, int(duracion))
+        except ValueError:
+            raise ValueError(message) from None
+
+    def validate(self):
+        if self.duracion <= 0:
+            raise ValueError("La duración debe ser mayor que cero")
+
+@dataclass(frozen=True)
+class SaleItem:
+    productoid: int
+    cantidad: int = 1
+
+    # El producto puede venir como opción de la lista ("12 - Nombre") o solo el id
+    @classmethod
+    def from_form(cls, producto, cantidad):
+        try:
+            return cls(leading_id(producto), int(cantidad))
+        except ValueError:
+            raise ValueError("elija un producto e indique la cantidad") from None
+
+    def validate(self):
+        if self.cantidad <= 0:
+            raise ValueError("La cantidad debe ser mayor que cero")
+
+@dataclass(frozen=True)
+class SaleInput:
+    clienteid: Optional[int]
+    items: Tuple[SaleItem, ...]
+
+    @classmethod
+    def from_form(cls, clienteid, items):
+        return cls(parse_int(clienteid, "Cliente ID debe ser un número", required=False), tuple(items))
+
+    def validate(self):
+        if not self.items:
+            raise ValueError("El carrito está vacío")
+        for item in self.items:
+            item.validate()
+
+@dataclass(frozen=True)
+class TreatmentInput:
+    citaid: int
+    tratamientoid: int
+    dosis: str = ''
+    duracion: Optional[int] = None
+
+    @classmethod
+    def from_form(cls, citaid, tratamiento, dosis='', duracion=''):
+        try:
+            tratamientoid = leading_id(tratamiento)
+        except ValueError:
+            raise ValueError("Elija un tratamiento") from None
+        return cls(parse_int(citaid, "Cita ID debe ser un número"), tratamientoid, dosis.strip(),
+                   parse_int(duracion, "La duración debe ser un número", required=False))
+
+    def validate(self):
+        if self.duracion is not None and self.duracion <= 0:
+            raise ValueError("La duración debe ser mayor que cero")
+
+# Función para llamar al procedimiento almacenado
+def call_add_pet_procedure(db, nombre, especie, raza, fechanacimiento, clienteid):
+    try:
+        db.execute(text("CALL sp_add_pet(:p_nombre, :p_especie, :p_raza, :p_fechanacimiento, :p_clienteid)"),
+                   {'p_nombre': nombre, 'p_especie': especie, 'p_raza': raza, 'p_fechanacimiento': fechanacimiento, 'p_clienteid': clienteid})
+        db.commit()
+    except Exception as e:
+        print(f"Error al llamar al procedimiento almacenado: {e}")
+        db.rollback()
+        raise
+
+# Operaciones: cada función recibe la conexión (lecturas sin ORM) o la sesión con
+# la que trabaja, así se pueden ejecutar con una sesión síncrona (VeterinariaService)
+# o con AsyncSession.run_sync (servidor.py).
+
+# Clientes
+# Si el email ya existe (la base lo rechaza) el error nombra al cliente que lo tiene
+def insert_client(db, data):
+    data.validate()
+    try:
+        client = insert_returning(db, Clientes, asdict(data))
+    except IntegrityError:
+        db.rollback()
+        # La caché puede tener el email de un cliente que otro puesto ya cambió
+        client_cache.invalidate(email=data.email)
+        existing = client_cache.get_by_email(db, data.email) if data.email else None
+        if existing is None:
+            raise
+        raise ValueError(f"El email ya está registrado para el cliente {existing.clienteid} ({owner_name(existing)})") from None
+    client_cache.put(client)
+    return client
+
+# Se borran todas las filas pedidas con un solo DELETE; devuelve los ids borrados
+def remove_clients(db, ids):
+    deleted = delete_returning(db, Clientes, list(ids))
+    for clienteid in deleted:
+        client_cache.invalidate(clienteid)
+    return deleted
+
+# Mascotas: los dueños que falten en la caché se cargan en una sola consulta por página
+def load_owners(conn, pets):
+    client_cache.get_many(conn, [pet.clienteid for pet in pets])
+    return pets
+
+def fetch_pets_with_owners(conn, after=None, limit=PAGE_SIZE):
+    return load_owners(conn, fetch_rows(conn, Mascotas, after, limit))
+
+def search_pets_with_owners(conn, term):
+    return load_owners(conn, search_rows(conn, Mascotas, term))
+
+def fetch_pets_by_ids(conn, ids):
+    return load_owners(conn, fetch_rows_by_ids(conn, Mascotas, list(ids)))
+
+# Alta de mascota: el dueño se valida con la caché de clientes (sin consulta si ya se conoce)
+def insert_pet(db, data):
+    data.validate()
+    if client_cache.get(db, data.clienteid) is None:
+        raise ValueError("Cliente ID no existente")
+    try:
+        return insert_returning(db, Mascotas, asdict(data))
+    except IntegrityError:
+        # Puede que otro puesto haya borrado al cliente
+        client_cache.invalidate(data.clienteid)
+        raise
+
+# Igual que insert_pet pero con el procedimiento almacenado sp_add_pet (CALL no
+# devuelve la fila creada)
+def insert_pet_with_procedure(db, data):
+    data.validate()
+    if client_cache.get(db, data.clienteid) is None:
+        raise ValueError("Cliente ID no existente")
+    call_add_pet_procedure(db, data.nombre, data.especie, data.raza, data.fechanacimiento, data.clienteid)
+
+# Historial de la mascota (más reciente primero); el nombre del veterinario sale
+# de la caché de referencia
+def fetch_history(conn, mascotaid, before=None, limit=HISTORY_PAGE_SIZE):
+    reference_cache.refresh(conn)
+    return pet_history(conn, mascotaid, before, limit)
+
+# Citas: el nombre del veterinario sale de la caché de referencia
+def fetch_appointments(db, after=None, limit=PAGE_SIZE):
+    reference_cache.refresh(db)
+    return fetch_page(db, Citas, after, limit, options=LIST_LOADS[Citas])
+
+# Alta de cita: se devuelve el objeto con las mismas relaciones que la lista
+def insert_appointment_for_list(db, data):
+    data.validate()
+    row = insert_appointment(db, asdict(data))
+    return fetch_objects_by_ids(db, Citas, [row.citaid], LIST_LOADS[Citas])[0]
+
+# Horarios libres durante "days" días desde "desde" (o desde hoy si es anterior:
+# los días pasados no tienen horarios, y así el período no se acorta)
+def search_free_slots(db, desde, duracion=DEFAULT_DURATION, especialidad=None, days=SLOT_SEARCH_DAYS, limit=10):
+    if duracion <= 0:
+        raise ValueError("La duración debe ser mayor que cero")
+    desde = max(desde, date.today())
+    return find_slots(db, desde, desde + timedelta(days=days - 1), duracion, especialidad, limit)
+
+# Tratamiento aplicado en una cita; el tratamiento se valida con la caché de referencia
+def insert_treatment(db, data):
+    data.validate()
+    if reference_cache.peek(Tratamientos, data.tratamientoid) is None:
+        reference_cache.refresh(db, force=True)
+        if reference_cache.peek(Tratamientos, data.tratamientoid) is None:
+            raise ValueError("Tratamiento ID no existente")
+    return insert_returning(db, TratamientosPorCita, asdict(data))
+
+# Ventas
+def fetch_sales(db, after=None, limit=PAGE_SIZE):
+    return fetch_page(db, Ventas, after, limit, options=LIST_LOADS[Ventas])
+
+# Cobrar una venta: devuelve el resultado de ventas.checkout y la venta con las
+# relaciones de la lista
+def checkout_for_list(db, data, fecha=None):
+    data.validate()
+    result = checkout(db, data.clienteid, [(item.productoid, item.cantidad) for item in data.items], fecha)
+    sale = fetch_objects_by_ids(db, Ventas, [result.venta.ventaid], LIST_LOADS[Ventas])[0]
+    return result, sale
+
+# Cada método abre su propia conexión o sesión del pool y la cierra al terminar,
+# así se puede llamar desde cualquier hilo (el DBWorker de la ventana, un script o
+# varios hilos del benchmark). Las lecturas de listas usan conexiones sin ORM;
+# las que muestran relaciones devuelven objetos ya cargados (LIST_LOADS).
+class VeterinariaService:
+    def __init__(self, bind=None):
+        self.bind = bind or engine
+        self.Session = SessionLocal if bind is None else sessionmaker(autocommit=False, autoflush=False, bind=bind)
+
+    def _with_session(self, fn, *args):
+        with self.Session() as db:
+            return fn(db, *args)
+
+    def _with_connection(self, fn, *args):
+        with self.bind.connect() as conn:
+            return fn(conn, *args)
+
+    # Datos de referencia (productos, tratamientos y veterinarios en memoria)
+    def refresh_references(self, force=False):
+        return self._with_connection(reference_cache.refresh, force)
+
+    def list_clients(self, after=None, limit=PAGE_SIZE):
+        return self._with_connection(fetch_rows, Clientes, after, limit)
+
+    def search_clients(self, term):
+        return self._with_connection(search_rows, Clientes, term)
+
+    def get_clients(self, ids):
+        return self._with_connection(fetch_rows_by_ids, Clientes, list(ids))
+
+    def add_client(self, data):
+        return self._with_session(insert_client, data)
+
+    def delete_clients(self, ids):
+        return self._with_session(remove_clients, ids)
+
+    def list_pets(self, after=None, limit=PAGE_SIZE):
+        return self._with_connection(fetch_pets_with_owners, after, limit)
+
+    def search_pets(self, term):
+        return self._with_connection(search_pets_with_owners, term)
+
+    def get_pets(self, ids):
+        return self._with_connection(fetch_pets_by_ids, ids)
+
+    def add_pet(self, data):
+        return self._with_session(insert_pet, data)
+
+    def add_pet_with_procedure(self, data):
+        return self._with_session(insert_pet_with_procedure, data)
+
+    def delete_pets(self, ids):
+        return self._with_session(delete_returning, Mascotas, list(ids))
+
+    def pet_history(self, mascotaid, before=None, limit=HISTORY_PAGE_SIZE):
+        return self._with_connection(fetch_history, mascotaid, before, limit)
+
+    def list_appointments(self, after=None, limit=PAGE_SIZE):
+        return self._with_session(fetch_appointments, after, limit)
+
+    def add_appointment(self, data):
+        return self._with_session(insert_appointment_for_list, data)
+
+    def delete_appointments(self, ids):
+        return self._with_session(delete_appointments, list(ids))
+
+    def find_slots(self, desde, duracion=DEFAULT_DURATION, especialidad=None, days=SLOT_SEARCH_DAYS, limit=10):
+        return self._with_session(search_free_slots, desde, duracion, especialidad, days, limit)
+
+    def add_treatment(self, data):
+        return self._with_session(insert_treatment, data)
+
+    def list_sales(self, after=None, limit=PAGE_SIZE):
+        return self._with_session(fetch_sales, after, limit)
+
+    def checkout(self, data, fecha=None):
+        return self._with_session(checkout_for_list, data, fecha)
@@ -0,0 +1,458 @@
+import json
+import asyncio
+import argparse
+import dataclasses
+from datetime import date, time
+from decimal import Decimal
+from typing import Union, get_args, get_origin
+
+from sqlalchemy.engine import make_url
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+
+try:
+    from aiohttp import web
+except ImportError:
+    web = None
+
+# orjson (opcional) convierte a JSON varias veces más rápido que json
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+from base import DATABASE_URL, engine_options, enforce_foreign_keys, Clientes, Mascotas, Veterinarios, Productos
+from configuracion import get_setting
+from consultas import PAGE_SIZE, fetch_rows, search_rows, fetch_rows_by_ids, delete_returning, SEARCH_MIN_LENGTH
+from cache_clientes import client_cache, owner_name
+from referencias import reference_cache
+from agenda import AppointmentConflictError, delete_appointments, DEFAULT_DURATION
+from auditoria import audit_writer
+from historial import history_key, HISTORY_PAGE_SIZE
+from instrumentacion import sql_stats, SQL_STATS
+from servicio import (ClientInput, PetInput, AppointmentInput, SaleItem, SaleInput, TreatmentInput, parse_date, parse_int,
+                      insert_client, remove_clients, fetch_pets_with_owners, search_pets_with_owners, fetch_pets_by_ids,
+                      insert_pet, fetch_history, fetch_appointments, insert_appointment_for_list, search_free_slots,
+                      insert_treatment, fetch_sales, checkout_for_list)
+
+# Servidor HTTP/JSON para que varios puestos (y un futuro sitio web) compartan un
+# solo proceso con un pool chico de conexiones. Es asíncrono (aiohttp + SQLAlchemy
+# asyncio): cientos de peticiones en espera no ocupan un hilo ni una conexión cada
+# una. Las operaciones son las mismas funciones de servicio.py, ejecutadas con
+# run_sync sobre la conexión o sesión asíncrona.
+#
+#   pip install aiohttp asyncpg          (aiosqlite para pruebas con SQLite; orjson opcional)
+#   python servidor.py --puerto 8080
+#
+#   GET    /clientes?despues=ID&limite=N&q=texto     GET /clientes/{id}
+#   POST   /clientes                                 DELETE /clientes/{id}
+#   GET    /mascotas?despues=ID&limite=N&q=texto     GET /mascotas/{id}
+#   POST   /mascotas                                 DELETE /mascotas/{id}
+#   GET    /mascotas/{id}/historial?antes=FECHA,HORA,CITAID
+#   GET    /citas?despues=ID&limite=N                POST /citas      DELETE /citas/{id}
+#   GET    /citas/horarios?desde=FECHA&duracion=MIN&especialidad=TEXTO
+#   POST   /citas/{id}/tratamientos
+#   GET    /ventas?despues=ID&limite=N               POST /ventas
+#   GET    /diagnostico                              (estadísticas de SQL, con SQL_STATS)
+#
+# La auditoría de citas se sigue escribiendo en segundo plano con el motor
+# síncrono de base.py (auditoria.py), por eso también hace falta su driver.
+
+API_HOST = get_setting("API_HOST", "127.0.0.1")
+API_PORT = get_setting("API_PORT", 8080, int)
+API_DATABASE_URL = get_setting("API_DATABASE_URL", DATABASE_URL)
+
+# Pool del servidor: lo comparten todas las peticiones en curso
+API_POOL_SIZE = get_setting("API_DB_POOL_SIZE", 10, int)
+API_MAX_OVERFLOW = get_setting("API_DB_MAX_OVERFLOW", 5, int)
+# El ping antes de cada préstamo es un viaje más por petición; sin él, si la base
+# se reinicia falla una petición y el pool descarta las conexiones viejas
+API_POOL_PRE_PING = get_setting("API_DB_POOL_PRE_PING", False, bool)
+
+# Máximo de filas por página que se puede pedir con "limite"
+API_MAX_LIMIT = get_setting("API_MAX_LIMIT", 1000, int)
+
+# Driver asíncrono de cada base
+ASYNC_DRIVERS = {
+    'postgresql': 'postgresql+asyncpg',
+    'sqlite': 'sqlite+aiosqlite',
+}
+
+# Función para pasar una URL de base.py a su driver asíncrono
+def async_url(url):
+    url = make_url(url)
+    backend = url.get_backend_name()
+    if backend not in ASYNC_DRIVERS:
+        raise ValueError(f"Base no soportada por el servidor: {backend}")
+    return url.set(drivername=ASYNC_DRIVERS[backend])
+
+def create_api_engine(url=API_DATABASE_URL):
+    url = async_url(url)
+    options = engine_options(url)
+    options['pool_pre_ping'] = API_POOL_PRE_PING
+    if 'pool_size' in options:
+        options.update(pool_size=API_POOL_SIZE, max_overflow=API_MAX_OVERFLOW)
+    api_engine = enforce_foreign_keys(create_async_engine(url, **options))
+    if SQL_STATS:
+        sql_stats.attach(api_engine)
+    return api_engine
+
+# Conversión a JSON: fechas y horas en ISO, importes como texto (sin perder decimales)
+def _json_default(value):
+    if isinstance(value, (date, time)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return str(value)
+    if isinstance(value, tuple):
+        # Tuplas con nombre: orjson no las convierte solo
+        return list(value)
+    raise TypeError(f"No se puede convertir a JSON: {type(value).__name__}")
+
+# Cuerpo de la respuesta ya codificado en UTF-8
+def _dumps(data):
+    if orjson is not None:
+        return orjson.dumps(data, default=_json_default)
+    return json.dumps(data, default=_json_default, ensure_ascii=False).encode()
+
+def row_json(row):
+    return dict(zip(row._fields, row))
+
+# Lista de filas: los nombres de las columnas se leen una vez (row._fields se
+# arma de nuevo en cada fila)
+def rows_json(rows):
+    fields = rows[0]._fields if rows else ()
+    return [dict(zip(fields, row)) for row in rows]
+
+def pet_json(pet):
+    return dict(zip(pet._fields, pet), dueno=owner_name(client_cache.peek(pet.clienteid)))
+
+def pets_json(pets):
+    fields = pets[0]._fields if pets else ()
+    return [dict(zip(fields, pet), dueno=owner_name(client_cache.peek(pet.clienteid))) for pet in pets]
+
+def appointment_json(cita):
+    return {
+        'citaid': cita.citaid,
+        'fecha': cita.fecha,
+        'hora': cita.hora,
+        'duracion': cita.duracion,
+        'mascotaid': cita.mascotaid,
+        'mascota': cita.mascota.nombre,
+        'veterinarioid': cita.veterinarioid,
+        'veterinario': reference_cache.label(Veterinarios, cita.veterinarioid),
+        'descripcion': cita.descripcion,
+        'tratamientos': [
+            {'tratamientoid': item.tratamientoid, 'nombre': item.tratamiento.nombre, 'dosis': item.dosis, 'duracion': item.duracion}
+            for item in cita.tratamientos
+        ],
+    }
+
+def sale_json(venta):
+    return {
+        'ventaid': venta.ventaid,
+        'fecha': venta.fecha,
+        'clienteid': venta.clienteid,
+        'cliente': owner_name(venta.cliente),
+        'total': venta.total,
+        'detalles': [
+            {'productoid': line.productoid, 'producto': line.producto.nombre, 'cantidad': line.cantidad, 'preciounitario': line.preciounitario}
+            for line in venta.detalles
+        ],
+    }
+
+def visit_json(visit):
+    return dict(visit._asdict(), veterinario=reference_cache.label(Veterinarios, visit.veterinarioid),
+                tratamientos=[treatment._asdict() for treatment in visit.tratamientos])
+
+def slot_json(slot):
+    return dict(slot._asdict(), veterinario=reference_cache.label(Veterinarios, slot.veterinarioid))
+
+# Función para armar una entrada de servicio.py desde el JSON recibido: cada
+# campo se convierte según el tipo declarado en la dataclass
+def input_from_json(cls, values):
+    if not isinstance(values, dict):
+        raise ValueError("Se esperaba un objeto JSON")
+    fields = {field.name: field for field in dataclasses.fields(cls)}
+    unknown = sorted(set(values) - set(fields))
+    if unknown:
+        raise ValueError(f"Campos desconocidos: {', '.join(unknown)}")
+    converted = {}
+    for name, value in values.items():
+        kind = fields[name].type
+        if get_origin(kind) is Union:
+            if value is None:
+                converted[name] = None
+                continue
+            kind = next(arg for arg in get_args(kind) if arg is not type(None))
+        converted[name] = _convert(kind, value, name)
+    try:
+        return cls(**converted)
+    except TypeError:
+        missing = [name for name, field in fields.items()
+                   if name not in converted and field.default is dataclasses.MISSING]
+        raise ValueError(f"Faltan campos: {', '.join(missing)}") from None
+
+def _convert(kind, value, name):
+    try:
+        if kind is date:
+            return date.fromisoformat(value)
+        if kind is time:
+            return time.fromisoformat(value)
+        if kind is int:
+            if isinstance(value, bool):
+                raise ValueError
+            return int(value)
+        if kind is str:
+            return str(value).strip()
+    except (TypeError, ValueError):
+        raise ValueError(f"Valor inválido para {name}") from None
+    return value
+
+def sale_from_json(values):
+    if not isinstance(values, dict) or not isinstance(values.get('items'), list):
+        raise ValueError("Se esperaba un objeto JSON con la lista items")
+    items = tuple(input_from_json(SaleItem, item) for item in values['items'])
+    return SaleInput(parse_int(values.get('clienteid'), "Cliente ID debe ser un número", required=False), items)
+
+# Errores de la aplicación -> respuestas JSON con el código HTTP que corresponde
+def _error(status, message):
+    return _json({'error': message}, status=status)
+
+def _error_middleware():
+    @web.middleware
+    async def middleware(request, handler):
+        try:
+            if not sql_stats.enabled:
+                return await handler(request)
+            # Con estadísticas: las sentencias se cuentan por ruta ("GET /clientes/{id}")
+            resource = request.match_info.route.resource
+            with sql_stats.action(f"{request.method} {resource.canonical if resource is not None else request.path}"):
+                return await handler(request)
+        except AppointmentConflictError as e:
+            return _error(409, str(e))
+        except ValueError as e:
+            return _error(400, str(e))
+        except IntegrityError:
+            return _error(409, "La operación viola una restricción de la base de datos")
+    return middleware
+
+def _json(data, status=200):
+    return web.Response(body=_dumps(data), status=status, content_type='application/json')
+
+def _path_id(request):
+    return parse_int(request.match_info['id'], "El id debe ser un número")
+
+# Página de una lista: "despues" es la clave primaria de la última fila recibida
+def _page_args(request):
+    after = parse_int(request.query.get('despues'), "despues debe ser un número", required=False)
+    limit = parse_int(request.query.get('limite'), "limite debe ser un número", required=False) or PAGE_SIZE
+    return (after,) if after is not None else None, max(1, min(limit, API_MAX_LIMIT))
+
+def _page(rows, limit, key, convert):
+    return {'datos': [convert(row) for row in rows], 'siguiente': key(rows[-1]) if len(rows) == limit else None}
+
+def _rows_page(rows, limit, key, convert_rows):
+    return {'datos': convert_rows(rows), 'siguiente': key(rows[-1]) if len(rows) == limit else None}
+
+async def _json_body(request):
+    try:
+        return await request.json()
+    except json.JSONDecodeError:
+        raise ValueError("El cuerpo no es JSON válido") from None
+
+# Peticiones HTTP. Cada una toma una conexión (lecturas) o sesión (escrituras) del
+# pool asíncrono solo mientras dura su consulta.
+class VeterinariaApi:
+    def __init__(self, bind=None):
+        self.engine = bind or create_api_engine()
+        self.Session = async_sessionmaker(self.engine, expire_on_commit=False)
+        # Las lecturas van sin transacción explícita (el mismo pool): con READ
+        # COMMITTED cada sentencia ya ve su propia foto de la base, y así se
+        # ahorran el BEGIN y el ROLLBACK, dos viajes más por petición
+        self.reads = self.engine.execution_options(isolation_level="AUTOCOMMIT")
+        # Respuesta de /referencias ya convertida a JSON: (versión de la caché, cuerpo)
+        self._references = None
+
+    # Ejecutar fn(conn, *args) y convertir el resultado dentro de run_sync: los
+    # objetos ORM se leen con la sesión todavía abierta
+    async def with_connection(self, convert, fn, *args):
+        async with self.reads.connect() as conn:
+            return await conn.run_sync(lambda sync_conn: convert(fn(sync_conn, *args)))
+
+    async def with_session(self, convert, fn, *args):
+        async with self.Session() as db:
+            return await db.run_sync(lambda sync_db: convert(fn(sync_db, *args)))
+
+    async def start(self, app):
+        # Primera carga de la caché de referencia antes de atender peticiones
+        await self.with_connection(bool, reference_cache.refresh, True)
+
+    async def stop(self, app):
+        await self.engine.dispose()
+        await asyncio.get_running_loop().run_in_executor(None, audit_writer.shutdown)
+
+    # Clientes
+    async def list_clients(self, request):
+        term = request.query.get('q', '').strip()
+        if term:
+            if len(term) < SEARCH_MIN_LENGTH:
+                raise ValueError(f"La búsqueda necesita al menos {SEARCH_MIN_LENGTH} caracteres")
+            return _json({'datos': await self.with_connection(rows_json, search_rows, Clientes, term), 'siguiente': None})
+        after, limit = _page_args(request)
+        return _json(await self.with_connection(lambda rows: _rows_page(rows, limit, lambda row: row.clienteid, rows_json), fetch_rows, Clientes, after, limit))
+
+    async def get_client(self, request):
+        rows = await self.with_connection(rows_json, fetch_rows_by_ids, Clientes, [_path_id(request)])
+        if not rows:
+            raise web.HTTPNotFound()
+        return _json(rows[0])
+
+    async def add_client(self, request):
+        data = input_from_json(ClientInput, await _json_body(request))
+        return _json(await self.with_session(row_json, insert_client, data), status=201)
+
+    async def delete_client(self, request):
+        if not await self.with_session(list, remove_clients, [_path_id(request)]):
+            raise web.HTTPNotFound()
+        return web.Response(status=204)
+
+    # Mascotas
+    async def list_pets(self, request):
+        term = request.query.get('q', '').strip()
+        if term:
+            if len(term) < SEARCH_MIN_LENGTH:
+                raise ValueError(f"La búsqueda necesita al menos {SEARCH_MIN_LENGTH} caracteres")
+            return _json({'datos': await self.with_connection(pets_json, search_pets_with_owners, term), 'siguiente': None})
+        after, limit = _page_args(request)
+        return _json(await self.with_connection(lambda rows: _rows_page(rows, limit, lambda row: row.mascotaid, pets_json), fetch_pets_with_owners, after, limit))
+
+    async def get_pet(self, request):
+        rows = await self.with_connection(pets_json, fetch_pets_by_ids, [_path_id(request)])
+        if not rows:
+            raise web.HTTPNotFound()
+        return _json(rows[0])
+
+    async def add_pet(self, request):
+        data = input_from_json(PetInput, await _json_body(request))
+        return _json(await self.with_session(pet_json, insert_pet, data), status=201)
+
+    async def delete_pet(self, request):
+        if not await self.with_session(list, delete_returning, Mascotas, [_path_id(request)]):
+            raise web.HTTPNotFound()
+        return web.Response(status=204)
+
+    # Cursor del historial: "fecha,hora,citaid" de la última visita recibida
+    async def pet_history(self, request):
+        before = request.query.get('antes')
+        if before:
+            try:
+                fecha, hora, citaid = before.split(',')
+                before = (date.fromisoformat(fecha), time.fromisoformat(hora), int(citaid))
+            except ValueError:
+                raise ValueError("antes debe ser FECHA,HORA,CITAID") from None
+        def convert(visits):
+            page = _page(visits, HISTORY_PAGE_SIZE, history_key, visit_json)
+            if page['siguiente'] is not None:
+                fecha, hora, citaid = page['siguiente']
+                page['siguiente'] = f"{fecha.isoformat()},{hora.isoformat()},{citaid}"
+            return page
+        return _json(await self.with_connection(convert, fetch_history, _path_id(request), before or None))
+
+    # Citas
+    async def list_appointments(self, request):
+        after, limit = _page_args(request)
+        return _json(await self.with_session(lambda citas: _page(citas, limit, lambda cita: cita.citaid, appointment_json), fetch_appointments, after, limit))
+
+    async def add_appointment(self, request):
+        data = input_from_json(AppointmentInput, await _json_body(request))
+        return _json(await self.with_session(appointment_json, insert_appointment_for_list, data), status=201)
+
+    async def delete_appointment(self, request):
+        if not await self.with_session(list, delete_appointments, [_path_id(request)]):
+            raise web.HTTPNotFound()
+        return web.Response(status=204)
+
+    async def find_slots(self, request):
+        desde = parse_date(request.query.get('desde'), required=False) or date.today()
+        duracion = parse_int(request.query.get('duracion'), "duracion debe ser un número", required=False) or DEFAULT_DURATION
+        especialidad = request.query.get('especialidad') or None
+        return _json(await self.with_session(lambda slots: [slot_json(slot) for slot in slots], search_free_slots, desde, duracion, especialidad))
+
+    async def add_treatment(self, request):
+        values = await _json_body(request)
+        if not isinstance(values, dict):
+            raise ValueError("Se esperaba un objeto JSON")
+        data = input_from_json(TreatmentInput, dict(values, citaid=_path_id(request)))
+        return _json(await self.with_session(row_json, insert_treatment, data), status=201)
+
+    # Ventas
+    async def list_sales(self, request):
+        after, limit = _page_args(request)
+        return _json(await self.with_session(lambda sales: _page(sales, limit, lambda venta: venta.ventaid, sale_json), fetch_sales, after, limit))
+
+    async def checkout(self, request):
+        data = sale_from_json(await _json_body(request))
+        return _json(await self.with_session(lambda result: sale_json(result[1]), checkout_for_list, data), status=201)
+
+    # Productos, tratamientos y veterinarios (desde la caché de referencia). La
+    # conexión solo se pide cuando toca revisar la caché, y el JSON se rearma
+    # solo cuando la caché cambió
+    async def references(self, request):
+        if reference_cache.due():
+            await self.with_connection(bool, reference_cache.refresh)
+        version = reference_cache.version
+        if self._references is None or self._references[0] != version:
+            self._references = (version, _dumps({
+                'productos': [dict(productoid=row.productoid, nombre=row.nombre, precio=row.precio) for row in reference_cache.rows(Productos)],
+                'veterinarios': [dict(veterinarioid=row.veterinarioid, nombre=reference_cache.label(Veterinarios, row.veterinarioid),
+                                      especialidad=row.especialidad) for row in reference_cache.rows(Veterinarios)],
+            }))
+        return web.Response(body=self._references[1], content_type='application/json')
+
+    # Estadísticas de SQL del servidor (instrumentacion.py); ?reiniciar=1 las vacía
+    async def diagnostics(self, request):
+        snapshot = sql_stats.snapshot()
+        if request.query.get('reiniciar'):
+            sql_stats.reset()
+        return _json(snapshot)
+
+    def routes(self):
+        return [
+            web.get('/clientes', self.list_clients),
+            web.post('/clientes', self.add_client),
+            web.get('/clientes/{id}', self.get_client),
+            web.delete('/clientes/{id}', self.delete_client),
+            web.get('/mascotas', self.list_pets),
+            web.post('/mascotas', self.add_pet),
+            web.get('/mascotas/{id}', self.get_pet),
+            web.delete('/mascotas/{id}', self.delete_pet),
+            web.get('/mascotas/{id}/historial', self.pet_history),
+            web.get('/citas', self.list_appointments),
+            web.post('/citas', self.add_appointment),
+            web.get('/citas/horarios', self.find_slots),
+            web.delete('/citas/{id}', self.delete_appointment),
+            web.post('/citas/{id}/tratamientos', self.add_treatment),
+            web.get('/ventas', self.list_sales),
+            web.post('/ventas', self.checkout),
+            web.get('/referencias', self.references),
+            web.get('/diagnostico', self.diagnostics),
+        ]
+
+# Función para armar la aplicación aiohttp (bind: motor asíncrono a usar)
+def create_app(bind=None):
+    if web is None:
+        raise RuntimeError("Para el servidor HTTP instale aiohttp y el driver asíncrono (pip install aiohttp asyncpg)")
+    api = VeterinariaApi(bind)
+    app = web.Application(middlewares=[_error_middleware()])
+    app.add_routes(api.routes())
+    app.on_startup.append(api.start)
+    app.on_cleanup.append(api.stop)
+    return app
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Servidor HTTP/JSON de la veterinaria")
+    parser.add_argument("--host", default=API_HOST)
+    parser.add_argument("--puerto", type=int, default=API_PORT)
+    args = parser.parse_args()
+    # Sin registro de accesos: una línea por petición cuesta más que la petición
+    web.run_app(create_app(), host=args.host, port=args.puerto, access_log=None)
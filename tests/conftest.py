@@ -0,0 +1,58 @@
+import os
+import sys
+import tempfile
+from types import SimpleNamespace
+
+import pytest
+
+# Los módulos están en la raíz del proyecto y base.py crea el motor al importarse:
+# las pruebas usan un SQLite temporal salvo que se indique DATABASE_URL
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.environ.setdefault("DATABASE_URL", "sqlite:///" + os.path.join(tempfile.gettempdir(), "veterinaria_pruebas.db"))
+os.environ.setdefault("DB_ECHO", "0")
+
+from sqlalchemy import create_engine, insert
+
+from base import enforce_foreign_keys, Clientes, Mascotas, Veterinarios
+from auditoria import AuditWriter
+from esquema import migrate
+from referencias import reference_cache
+
+# Bases donde corren las pruebas: un SQLite nuevo por prueba y, si se indica
+# TEST_POSTGRES_URL, también PostgreSQL. Esa base debe ser descartable: al final
+# de cada prueba se borra y se vuelve a crear el esquema public.
+BACKENDS = ["sqlite"] + (["postgresql"] if os.environ.get("TEST_POSTGRES_URL") else [])
+
+@pytest.fixture(params=BACKENDS)
+def bind(request, tmp_path, monkeypatch):
+    if request.param == "sqlite":
+        bind = enforce_foreign_keys(create_engine(f"sqlite:///{tmp_path / 'veterinaria.db'}"))
+    else:
+        bind = create_engine(os.environ["TEST_POSTGRES_URL"])
+    migrate(bind)
+    # La auditoría de las citas va a la base de la prueba y se escribe antes de borrarla
+    writer = AuditWriter(bind)
+    monkeypatch.setattr("agenda.audit_writer", writer)
+    yield bind
+    writer.shutdown()
+    if request.param == "postgresql":
+        with bind.begin() as conn:
+            conn.exec_driver_sql("DROP SCHEMA public CASCADE")
+            conn.exec_driver_sql("CREATE SCHEMA public")
+    bind.dispose()
+
+# Datos mínimos de una clínica: un cliente con una mascota y dos veterinarios. La
+# caché de referencia es global: se vacía para que no traiga datos de otra base.
+@pytest.fixture
+def clinica(bind):
+    with bind.begin() as conn:
+        clienteid = conn.execute(insert(Clientes).values(nombre="Ana", apellido="García", email="ana@prueba.test")
+                                 .returning(Clientes.clienteid)).scalar()
+        mascotaid = conn.execute(insert(Mascotas).values(nombre="Luna", especie="Perro", clienteid=clienteid)
+                                 .returning(Mascotas.mascotaid)).scalar()
+        vets = [conn.execute(insert(Veterinarios).values(nombre=nombre, apellido="Pérez", especialidad="General")
+                             .returning(Veterinarios.veterinarioid)).scalar() for nombre in ("Luis", "Sofía")]
+    reference_cache.clear()
+    yield SimpleNamespace(clienteid=clienteid, mascotaid=mascotaid, vets=vets)
+    reference_cache.clear()
@@ -0,0 +1,113 @@
+import threading
+from datetime import date, time, timedelta
+
+import pytest
+from sqlalchemy import insert, update
+from sqlalchemy.exc import IntegrityError, OperationalError
+from sqlalchemy.orm import Session
+
+from base import Citas, Veterinarios
+from agenda import AgendaCache, AppointmentConflictError, find_slots, find_conflict, insert_appointment, update_appointment
+from referencias import reference_cache
+from servicio import VeterinariaService, AppointmentInput
+
+# Guarda los días cuya ocupación se pidió
+class SpyCache(AgendaCache):
+    def __init__(self):
+        super().__init__()
+        self.requested = []
+
+    def occupancy(self, db, fechas, vets):
+        self.requested.extend(fechas)
+        return super().occupancy(db, fechas, vets)
+
+def test_find_slots_skips_past_days_before_reading(bind):
+    with bind.begin() as conn:
+        conn.execute(insert(Veterinarios).values(nombre="Ana", apellido="García", especialidad="General"))
+    reference_cache.clear()
+    today = date.today()
+    cache = SpyCache()
+    with Session(bind) as db:
+        assert find_slots(db, today - timedelta(days=30), today - timedelta(days=1), cache=cache) == []
+        assert cache.requested == []
+
+        slots = find_slots(db, today - timedelta(days=5), today + timedelta(days=2), limit=100, cache=cache)
+    assert cache.requested == [today, today + timedelta(days=1), today + timedelta(days=2)]
+    assert slots and all(slot.fecha >= today for slot in slots)
+    reference_cache.clear()
+
+# Una cita que pasa la medianoche choca con las de la mañana siguiente
+def test_conflict_across_midnight(bind, clinica):
+    vet = clinica.vets[0]
+    tomorrow = date.today() + timedelta(days=1)
+    with Session(bind) as db:
+        early = insert_appointment(db, dict(fecha=tomorrow + timedelta(days=1), hora=time(0, 30), duracion=30,
+                                            mascotaid=clinica.mascotaid, veterinarioid=vet))
+        conflict = find_conflict(db, vet, tomorrow, time(23, 30), 90)
+        assert conflict is not None and conflict.citaid == early.citaid
+        assert find_conflict(db, vet, tomorrow, time(23, 0), 60) is None
+
+# La base rechaza el cruce aunque la cita se escriba sin pasar por agenda.py
+def test_database_rejects_overlap(bind, clinica):
+    vet = clinica.vets[0]
+    fecha = date.today() + timedelta(days=3)
+    with bind.begin() as conn:
+        conn.execute(insert(Citas).values(fecha=fecha, hora=time(10), duracion=60, mascotaid=clinica.mascotaid, veterinarioid=vet))
+    with pytest.raises(IntegrityError, match="citas_sin_solapamiento"):
+        with bind.begin() as conn:
+            conn.execute(insert(Citas).values(fecha=fecha, hora=time(10, 30), duracion=30, mascotaid=clinica.mascotaid, veterinarioid=vet))
+    with bind.begin() as conn:
+        # Seguida, de otro veterinario o modificada sin cruzarse: se acepta
+        conn.execute(insert(Citas).values(fecha=fecha, hora=time(11), duracion=30, mascotaid=clinica.mascotaid, veterinarioid=vet))
+        conn.execute(insert(Citas).values(fecha=fecha, hora=time(10), duracion=30, mascotaid=clinica.mascotaid, veterinarioid=clinica.vets[1]))
+        conn.execute(update(Citas).where(Citas.hora == time(11)).values(descripcion="Control"))
+
+# Dos hilos agendan el mismo horario a la vez: solo uno lo consigue
+def test_concurrent_bookings_do_not_double_book(bind, clinica):
+    values = dict(fecha=date.today() + timedelta(days=4), hora=time(9), duracion=30,
+                  mascotaid=clinica.mascotaid, veterinarioid=clinica.vets[0])
+    barrier = threading.Barrier(4)
+    results = []
+
+    def book():
+        with Session(bind) as db:
+            barrier.wait()
+            try:
+                results.append(insert_appointment(db, values).citaid)
+            except AppointmentConflictError as e:
+                results.append(e)
+            except OperationalError as e:
+                # SQLite: "database is locked" si el otro escritor tarda más que el timeout
+                results.append(e)
+
+    threads = [threading.Thread(target=book) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    booked = [result for result in results if isinstance(result, int)]
+    assert len(booked) == 1
+    assert all(f"cita {booked[0]}" in str(result) for result in results if isinstance(result, AppointmentConflictError))
+
+# El cruce se rechaza al agendar y al mover una cita, con un mensaje que nombra la
+# cita existente; el propio horario de la cita que se mueve no cuenta como cruce
+def test_overlap_error_names_existing_cita(bind, clinica):
+    service = VeterinariaService(bind)
+    fecha = date.today() + timedelta(days=5)
+    first = service.add_appointment(AppointmentInput.from_form(
+        fecha=fecha.isoformat(), hora="10:00", duracion="60", mascotaid=str(clinica.mascotaid),
+        veterinario=str(clinica.vets[0]), descripcion="Vacuna"))
+    with pytest.raises(AppointmentConflictError, match=f"cita {first.citaid} el {fecha} a las 10:00 \\(60 min\\)"):
+        service.add_appointment(AppointmentInput.from_form(
+            fecha=fecha.isoformat(), hora="10:45", duracion="30", mascotaid=str(clinica.mascotaid),
+            veterinario=str(clinica.vets[0]), descripcion="Control"))
+
+    with Session(bind) as db:
+        later = insert_appointment(db, dict(fecha=fecha, hora=time(12), duracion=30,
+                                            mascotaid=clinica.mascotaid, veterinarioid=clinica.vets[0]))
+        with pytest.raises(AppointmentConflictError, match=f"cita {first.citaid} "):
+            update_appointment(db, later.citaid, dict(hora=time(10, 30)))
+        assert update_appointment(db, later.citaid, dict(hora=time(11), duracion=45)).hora == time(11)
+        assert update_appointment(db, later.citaid, dict(descripcion="Control")).descripcion == "Control"
+    with bind.connect() as conn:
+        assert len(conn.execute(Citas.__table__.select().where(Citas.fecha == fecha)).all()) == 2
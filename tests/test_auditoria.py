@@ -0,0 +1,49 @@
+import time
+from datetime import date, time as hour
+from types import SimpleNamespace
+
+from sqlalchemy import create_engine, select, func
+
+from base import AuditoriaCitas
+from auditoria import AuditWriter, CREATE
+from esquema import migrate
+
+def cita(citaid):
+    return SimpleNamespace(citaid=citaid, fecha=date(2024, 5, 1), hora=hour(9), mascotaid=1, veterinarioid=1, descripcion=None)
+
+def count(bind):
+    with bind.connect() as conn:
+        return conn.execute(select(func.count()).select_from(AuditoriaCitas)).scalar()
+
+# Mientras la base no acepta el INSERT (aquí: tabla todavía sin crear) el lote se
+# conserva y se reintenta; nada se pierde cuando la base vuelve
+def test_failed_batch_is_retried(tmp_path):
+    bind = create_engine(f"sqlite:///{tmp_path / 'auditoria.db'}")
+    writer = AuditWriter(bind, batch_size=2, flush_ms=10, retry_ms=20, retry_max_ms=50)
+    for citaid in range(5):
+        writer.record(CREATE, cita(citaid))
+    time.sleep(0.2)
+    assert writer.retries > 0 and writer.written == 0
+    migrate(bind)
+    time.sleep(0.2)
+    writer.shutdown()
+    assert count(bind) == 5
+    assert (writer.written, writer.failed) == (5, 0)
+
+# Al cerrar se escribe en el hilo que llama lo que el hilo de fondo no pudo
+def test_shutdown_writes_pending_events(bind):
+    writer = AuditWriter(bind, batch_size=100, flush_ms=60000)
+    for citaid in range(3):
+        writer.record(CREATE, cita(citaid))
+    writer.shutdown()
+    assert count(bind) == 3
+    # Después del cierre se escribe directamente
+    writer.record(CREATE, cita(9))
+    assert count(bind) == 4
+
+def test_shutdown_reports_events_it_cannot_write(tmp_path):
+    writer = AuditWriter(create_engine(f"sqlite:///{tmp_path / 'vacia.db'}"), flush_ms=10, retry_ms=10, shutdown_retries=1)
+    writer.record(CREATE, cita(1))
+    writer.shutdown()
+    assert writer.failed == 1
+    assert not writer._thread.is_alive()
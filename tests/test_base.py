@@ -0,0 +1,40 @@
+from datetime import date, time
+
+import pytest
+from sqlalchemy import insert, select, func
+from sqlalchemy.exc import IntegrityError
+
+from base import Clientes, Mascotas, Citas, Tratamientos, TratamientosPorCita
+from servicio import VeterinariaService
+
+def count(bind, model):
+    with bind.connect() as conn:
+        return conn.execute(select(func.count()).select_from(model)).scalar()
+
+# Las claves foráneas se revisan también en SQLite: no quedan mascotas sin dueño
+# ni tratamientos de citas borradas
+def test_delete_with_children_is_rejected(bind, clinica):
+    with bind.begin() as conn:
+        citaid = conn.execute(insert(Citas).values(fecha=date(2024, 5, 1), hora=time(10), duracion=30, mascotaid=clinica.mascotaid,
+                                                   veterinarioid=clinica.vets[0]).returning(Citas.citaid)).scalar()
+        tratamientoid = conn.execute(insert(Tratamientos).values(nombre="Vacuna").returning(Tratamientos.tratamientoid)).scalar()
+        conn.execute(insert(TratamientosPorCita).values(citaid=citaid, tratamientoid=tratamientoid, dosis="1"))
+    service = VeterinariaService(bind)
+
+    with pytest.raises(IntegrityError):
+        service.delete_clients([clinica.clienteid])
+    with pytest.raises(IntegrityError):
+        service.delete_appointments([citaid])
+    assert count(bind, Clientes) == 1 and count(bind, Citas) == 1 and count(bind, TratamientosPorCita) == 1
+
+    # Un dueño inexistente también se rechaza al escribir
+    with pytest.raises(IntegrityError):
+        with bind.begin() as conn:
+            conn.execute(insert(Mascotas).values(nombre="Toby", clienteid=clinica.clienteid + 100))
+
+    # Sin hijos el borrado pasa
+    with bind.begin() as conn:
+        conn.execute(TratamientosPorCita.__table__.delete())
+    assert service.delete_appointments([citaid]) == [citaid]
+    assert service.delete_pets([clinica.mascotaid]) == [clinica.mascotaid]
+    assert service.delete_clients([clinica.clienteid]) == [clinica.clienteid]
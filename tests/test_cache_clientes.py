@@ -0,0 +1,37 @@
+from collections import namedtuple
+
+import pytest
+from sqlalchemy import insert
+
+from base import Clientes
+from cache_clientes import ClientCache, client_cache
+from servicio import VeterinariaService, ClientInput
+
+CachedClient = namedtuple('CachedClient', 'clienteid nombre apellido email')
+
+# Cada búsqueda por email cuenta un solo acierto o una sola falta
+def test_get_by_email_counts_once(bind, clinica):
+    cache = ClientCache()
+    with bind.connect() as conn:
+        assert cache.get_by_email(conn, "ana@prueba.test").clienteid == clinica.clienteid
+        assert (cache.hits, cache.misses) == (0, 1)
+        assert cache.get_by_email(conn, "ana@prueba.test").clienteid == clinica.clienteid
+        assert (cache.hits, cache.misses) == (1, 1)
+        assert cache.get_by_email(conn, "nadie@prueba.test") is None
+        assert (cache.hits, cache.misses) == (1, 2)
+
+# Un email repetido se rechaza con un mensaje que nombra al cliente que ya lo tiene,
+# aunque la caché recuerde ese email para otro cliente
+def test_duplicate_email_names_existing_client(bind, clinica):
+    client_cache.clear()
+    with bind.begin() as conn:
+        otro = conn.execute(insert(Clientes).values(nombre="Otro", email="otro@prueba.test").returning(Clientes.clienteid)).scalar()
+    # Dato viejo: otro puesto le cambió el email a este cliente
+    client_cache.put(CachedClient(otro, "Otro", "", "ana@prueba.test"))
+    service = VeterinariaService(bind)
+    with pytest.raises(ValueError, match=f"cliente {clinica.clienteid} \\(Ana García\\)"):
+        service.add_client(ClientInput("Ana", email="ana@prueba.test"))
+    assert client_cache.peek(clinica.clienteid).email == "ana@prueba.test"
+    assert client_cache.peek(otro) is None
+    assert service.add_client(ClientInput("Nuevo", email="nuevo@prueba.test")).clienteid > otro
+    client_cache.clear()
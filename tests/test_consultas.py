@@ -0,0 +1,22 @@
+from sqlalchemy import insert
+
+from base import Clientes
+from consultas import fetch_rows, fetch_rows_by_ids, keyset_statement
+
+# Las páginas se leen con una sentencia armada una sola vez por lista; la
+# clave "after" y el límite llegan como parámetros
+def test_keyset_pages_reuse_statement(bind):
+    with bind.begin() as conn:
+        conn.execute(insert(Clientes), [dict(nombre=f"Cliente {n}", apellido="Prueba") for n in range(7)])
+    seen = []
+    after = None
+    with bind.connect() as conn:
+        while True:
+            page = fetch_rows(conn, Clientes, after, 3)
+            seen.extend(row.clienteid for row in page)
+            if len(page) < 3:
+                break
+            after = (page[-1].clienteid,)
+        assert [row.clienteid for row in fetch_rows_by_ids(conn, Clientes, seen[2:4])] == seen[2:4]
+    assert seen == sorted(seen) and len(seen) == 7
+    assert keyset_statement.cache_info().currsize >= 2
@@ -0,0 +1,51 @@
+from datetime import date, time
+
+import pytest
+from sqlalchemy import create_engine, insert, inspect
+from sqlalchemy.exc import OperationalError
+
+import esquema
+from base import Base, Citas, enforce_foreign_keys
+from esquema import SchemaError, _add_appointment_overlap, check_schema, migrate
+
+# Una base con citas cruzadas (de antes del control) no puede recibir la
+# restricción: la migración lo dice con los citaid en vez de un error opaco
+def test_overlap_migration_lists_overlapping_citas(bind, clinica):
+    if bind.dialect.name != 'postgresql':
+        pytest.skip("la restricción de exclusión es solo de PostgreSQL")
+    with bind.begin() as conn:
+        conn.exec_driver_sql("ALTER TABLE citas DROP CONSTRAINT citas_sin_solapamiento")
+        ids = [conn.execute(insert(Citas).values(fecha=date(2024, 5, 1), hora=hora, duracion=60, mascotaid=clinica.mascotaid,
+                                                 veterinarioid=clinica.vets[0]).returning(Citas.citaid)).scalar()
+               for hora in (time(10), time(10, 30))]
+    with bind.begin() as conn, pytest.raises(SchemaError, match=f"{ids[0]}-{ids[1]}"):
+        _add_appointment_overlap(conn)
+
+# Una base que quedó en la versión 5 o en la 6 (la 6 se unió a la 7) llega a la
+# versión actual con todos los índices de los modelos
+@pytest.mark.parametrize("stored", [5, 6])
+def test_migrate_from_older_versions(tmp_path, monkeypatch, stored):
+    bind = enforce_foreign_keys(create_engine(f"sqlite:///{tmp_path / 'vieja.db'}"))
+    with monkeypatch.context() as patch:
+        patch.setattr(esquema, "MIGRATIONS", [step for step in esquema.MIGRATIONS if step[0] <= 5])
+        patch.setattr(esquema, "SCHEMA_VERSION", stored)
+        migrate(bind)
+    assert migrate(bind) == esquema.SCHEMA_VERSION
+    assert check_schema(bind) == esquema.SCHEMA_VERSION
+    indexes = inspect(bind)
+    for table in Base.metadata.sorted_tables:
+        names = {index['name'] for index in indexes.get_indexes(table.name)}
+        assert {index.name for index in table.indexes} <= names
+    bind.dispose()
+
+# Sin la tabla de versiones la base no está migrada; si ni siquiera se puede
+# conectar, el error de conexión llega tal cual
+def test_check_schema_separates_missing_schema_from_connection_errors(tmp_path):
+    bind = create_engine(f"sqlite:///{tmp_path / 'nueva.db'}")
+    with pytest.raises(SchemaError, match="no tiene esquema registrado"):
+        check_schema(bind)
+    bind.dispose()
+
+    unreachable = create_engine(f"sqlite:///{tmp_path / 'no_existe' / 'base.db'}")
+    with pytest.raises(OperationalError):
+        check_schema(unreachable)
@@ -0,0 +1,47 @@
+from datetime import date, time
+
+from sqlalchemy import insert
+
+from base import Citas, Tratamientos, TratamientosPorCita
+from historial import history_key
+from servicio import VeterinariaService
+
+# Cinco visitas con varios tratamientos cada una; dos a la misma hora con
+# veterinarios distintos (el orden entre ellas lo decide citaid)
+def add_visits(bind, clinica):
+    with bind.begin() as conn:
+        tratamientos = [conn.execute(insert(Tratamientos).values(nombre=nombre).returning(Tratamientos.tratamientoid)).scalar()
+                        for nombre in ("Antibiótico", "Curación", "Vacuna")]
+        visits = []
+        for fecha, hora, vet in ((date(2024, 1, 10), time(9), 0), (date(2024, 2, 5), time(10), 0),
+                                 (date(2024, 2, 5), time(10), 1), (date(2024, 3, 1), time(11), 0),
+                                 (date(2024, 4, 2), time(16), 1)):
+            citaid = conn.execute(insert(Citas).values(fecha=fecha, hora=hora, duracion=30, mascotaid=clinica.mascotaid,
+                                                       veterinarioid=clinica.vets[vet]).returning(Citas.citaid)).scalar()
+            conn.execute(insert(TratamientosPorCita), [dict(citaid=citaid, tratamientoid=tratamientoid, dosis="1")
+                                                       for tratamientoid in tratamientos])
+            visits.append(citaid)
+    return visits
+
+# El límite cuenta visitas y no filas del cruce con tratamientos: cada página trae
+# visitas completas y la siguiente sigue justo después de la última
+def test_history_pages_count_visits(bind, clinica):
+    citaids = add_visits(bind, clinica)
+    service = VeterinariaService(bind)
+    pages = []
+    before = None
+    while True:
+        page = service.pet_history(clinica.mascotaid, before, limit=2)
+        pages.append(page)
+        if len(page) < 2:
+            break
+        before = history_key(page[-1])
+
+    assert [len(page) for page in pages] == [2, 2, 1]
+    visits = [visit for page in pages for visit in page]
+    assert [visit.citaid for visit in visits] == [citaids[4], citaids[3], citaids[2], citaids[1], citaids[0]]
+    assert all([treatment.nombre for treatment in visit.tratamientos] == ["Antibiótico", "Curación", "Vacuna"]
+               for visit in visits)
+
+    # Una mascota sin visitas devuelve una página vacía
+    assert service.pet_history(clinica.mascotaid + 1) == []
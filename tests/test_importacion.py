@@ -0,0 +1,47 @@
+from sqlalchemy import select
+
+from base import Clientes, Mascotas
+from importacion import import_csv, parse_birthdate
+
+def write_csv(tmp_path, name, text):
+    path = tmp_path / name
+    path.write_text(text, encoding="utf-8")
+    return str(path)
+
+def test_parse_birthdate():
+    assert parse_birthdate("2020-02-29").isoformat() == "2020-02-29"
+    assert parse_birthdate("2023-02-30") is None
+    assert parse_birthdate("2023-04-31") is None
+    assert parse_birthdate("0000-01-01") is None
+    assert parse_birthdate("2023-2-3") is None
+
+def test_invalid_calendar_date_is_rejected(bind, tmp_path):
+    clients = write_csv(tmp_path, "clientes.csv", "nombre,apellido,email\nAna,García,ana@prueba.test\n")
+    assert import_csv("clientes", clients, bind) == (1, [])
+    pets = write_csv(tmp_path, "mascotas.csv",
+                     "nombre,especie,fechanacimiento,cliente_email\n"
+                     "Luna,Perro,2020-02-29,ana@prueba.test\n"
+                     "Max,Gato,2023-02-30,ana@prueba.test\n"
+                     "Toby,Perro,2023-13-01,ana@prueba.test\n"
+                     "Kira,Gato,2023-02-30,nadie@prueba.test\n"
+                     "Coco,Ave,,ana@prueba.test\n")
+    inserted, rejected = import_csv("mascotas", pets, bind)
+    assert inserted == 2
+    assert rejected == [(3, 'fecha de nacimiento inválida'), (4, 'fecha de nacimiento inválida'),
+                        (5, 'fecha de nacimiento inválida')]
+    with bind.connect() as conn:
+        names = conn.execute(select(Mascotas.nombre).order_by(Mascotas.mascotaid)).scalars().all()
+    assert names == ["Luna", "Coco"]
+
+# Un email queda tomado solo por la primera fila aceptada, no por una rechazada antes
+def test_duplicate_email_counts_only_accepted_rows(bind, tmp_path):
+    clients = write_csv(tmp_path, "clientes.csv",
+                        "nombre,apellido,email\n"
+                        ",Sin nombre,ana@prueba.test\n"
+                        "Ana,García,ana@prueba.test\n"
+                        "Ana,Otra,ana@prueba.test\n")
+    inserted, rejected = import_csv("clientes", clients, bind)
+    assert inserted == 1
+    assert rejected == [(2, 'nombre vacío'), (4, 'email repetido en el archivo')]
+    with bind.connect() as conn:
+        assert conn.execute(select(Clientes.apellido)).scalars().all() == ["García"]
@@ -0,0 +1,31 @@
+from sqlalchemy import create_engine, event, text
+
+from instrumentacion import SqlStats
+
+def test_statement_shape_groups_lists():
+    stats = SqlStats()
+    bind = create_engine("sqlite://")
+    stats.attach(bind)
+    with bind.connect() as conn:
+        conn.execute(text("SELECT 1 WHERE 1 IN (:a)"), {'a': 1})
+        conn.execute(text("SELECT 1 WHERE 1 IN (:a, :b, :c)"), {'a': 1, 'b': 2, 'c': 3})
+    stats.detach()
+    assert [(item['sql'], item['veces']) for item in stats.statements()] == [("SELECT 1 WHERE 1 IN (?, ...)", 2)]
+
+# Activar el registro desde el panel mientras otra sentencia está en curso: el
+# evento "after" llega sin su "before" y no debe romper la consulta de quien llama.
+# La función de SQLite conecta los eventos durante la ejecución de la sentencia.
+def test_attach_during_statement():
+    stats = SqlStats()
+    bind = create_engine("sqlite://")
+
+    @event.listens_for(bind, 'connect')
+    def register(dbapi_connection, connection_record):
+        dbapi_connection.create_function('activar_registro', 0, lambda: stats.attach(bind) or 1)
+
+    with bind.connect() as conn:
+        assert conn.execute(text("SELECT activar_registro()")).scalar() == 1
+        assert stats.enabled
+        assert conn.execute(text("SELECT 2")).scalar() == 2
+    stats.detach()
+    assert [(item['sql'], item['veces']) for item in stats.statements()] == [("SELECT 2", 1)]
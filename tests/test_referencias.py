@@ -0,0 +1,72 @@
+import threading
+from datetime import datetime, timedelta
+
+from sqlalchemy import insert, update
+
+from base import Tratamientos
+from referencias import ReferenceCache
+
+START = datetime(2024, 5, 1, 10, 0)
+
+def add_treatment(bind, nombre, actualizado):
+    with bind.begin() as conn:
+        return conn.execute(insert(Tratamientos).values(nombre=nombre, actualizado=actualizado)
+                            .returning(Tratamientos.tratamientoid)).scalar()
+
+def rename(bind, tratamientoid, nombre, actualizado):
+    with bind.begin() as conn:
+        conn.execute(update(Tratamientos).where(Tratamientos.tratamientoid == tratamientoid)
+                     .values(nombre=nombre, actualizado=actualizado))
+
+# Una transacción que empezó antes (marca menor) y confirmó después de la última
+# revisión no cambia ni la marca máxima ni la cantidad de filas
+def test_late_commit_with_older_timestamp_is_seen(bind):
+    cache = ReferenceCache(check_seconds=0, overlap=300)
+    vacuna = add_treatment(bind, "Vacuna", START)
+    add_treatment(bind, "Control", START + timedelta(seconds=20))
+    with bind.connect() as conn:
+        assert cache.refresh(conn)
+    assert cache.label(Tratamientos, vacuna) == "Vacuna"
+
+    rename(bind, vacuna, "Vacuna triple", START + timedelta(seconds=10))
+    with bind.connect() as conn:
+        assert cache.refresh(conn)
+    assert cache.label(Tratamientos, vacuna) == "Vacuna triple"
+
+    # Pasado el margen la tabla vuelve a revisarse con una sola consulta
+    cache._rescan_until[Tratamientos] = 0
+    with bind.connect() as conn:
+        assert not cache.refresh(conn)
+    assert cache._rescan_until[Tratamientos] is None
+
+# refresh(force=True) espera a la revisión en curso en vez de volver sin mirar
+def test_forced_refresh_waits_for_running_refresh(bind):
+    cache = ReferenceCache(check_seconds=3600)
+    with bind.connect() as conn:
+        cache.refresh(conn)
+    tratamientoid = add_treatment(bind, "Suero", START)
+
+    cache._refresh_lock.acquire()
+    threading.Timer(0.1, cache._refresh_lock.release).start()
+    with bind.connect() as conn:
+        assert not cache.refresh(conn)
+        assert cache.refresh(conn, force=True)
+    assert cache.label(Tratamientos, tratamientoid) == "Suero"
+
+# version solo cambia cuando cambian las filas en memoria; due() dice si
+# refresh() consultaría la base
+def test_version_follows_changes(bind):
+    cache = ReferenceCache(check_seconds=3600)
+    assert cache.due()
+    with bind.connect() as conn:
+        cache.refresh(conn)
+    version = cache.version
+    assert not cache.due()
+    with bind.connect() as conn:
+        assert not cache.refresh(conn, force=True)
+    assert cache.version == version
+
+    add_treatment(bind, "Suero", START)
+    with bind.connect() as conn:
+        assert cache.refresh(conn, force=True)
+    assert cache.version > version
@@ -0,0 +1,44 @@
+import threading
+
+from trabajador import DBWorker
+
+# Solo se usa root.after; las revisiones programadas no se ejecutan solas
+class FakeRoot:
+    def __init__(self):
+        self.scheduled = []
+
+    def after(self, ms, callback):
+        self.scheduled.append(callback)
+
+def test_shutdown_finishes_writes_and_cancels_keyed_reads():
+    worker = DBWorker(FakeRoot(), workers=1)
+    release = threading.Event()
+    ran, delivered, errors = [], [], []
+
+    def busy():
+        release.wait(5)
+
+    def read():
+        ran.append('lectura')
+
+    def write(value):
+        ran.append('alta')
+        return value
+
+    def failing_write():
+        ran.append('baja')
+        raise ValueError("sin permiso")
+
+    worker.submit(busy)
+    worker.submit(read, key='lista', on_done=delivered.append)
+    worker.submit(write, 42, on_done=delivered.append)
+    worker.submit(failing_write, on_error=errors.append)
+    threading.Timer(0.1, release.set).start()
+    worker.shutdown()
+
+    assert ran == ['alta', 'baja']
+    assert delivered == [42]
+    assert [str(error) for error in errors] == ["sin permiso"]
+    assert worker.in_flight == 0
+    # Lo que se pida después del cierre se ignora
+    assert worker.submit(read) is None
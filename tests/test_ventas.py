@@ -0,0 +1,69 @@
+from datetime import date
+from decimal import Decimal
+
+import pytest
+from sqlalchemy import insert, update, select, func
+
+from base import Productos, Ventas, DetalleVenta
+from cache_clientes import client_cache
+from servicio import VeterinariaService, SaleInput, SaleItem
+
+@pytest.fixture
+def productos(bind, clinica):
+    with bind.begin() as conn:
+        ids = [conn.execute(insert(Productos).values(nombre=nombre, precio=precio).returning(Productos.productoid)).scalar()
+               for nombre, precio in (("Alimento", Decimal("10.50")), ("Collar", Decimal("3.25")), ("Muestra", None))]
+    # La caché de clientes es global: que no traiga clientes de otra base
+    client_cache.clear()
+    yield ids
+    client_cache.clear()
+
+def count(bind, model):
+    with bind.connect() as conn:
+        return conn.execute(select(func.count()).select_from(model)).scalar()
+
+# El total y los precios unitarios salen de productos; un producto repetido en el
+# carrito se junta en una sola línea
+def test_checkout_totals_and_price_snapshot(bind, clinica, productos):
+    alimento, collar, _ = productos
+    service = VeterinariaService(bind)
+    items = (SaleItem(alimento, 2), SaleItem(collar, 1), SaleItem(alimento, 1))
+    result, sale = service.checkout(SaleInput(clinica.clienteid, items), fecha=date(2024, 5, 1))
+
+    assert result.venta.total == Decimal("34.75")
+    assert result.venta.clienteid == clinica.clienteid and result.venta.fecha == date(2024, 5, 1)
+    assert [(linea.productoid, linea.cantidad, linea.preciounitario) for linea in result.lineas] == [
+        (alimento, 3, Decimal("10.50")), (collar, 1, Decimal("3.25"))]
+    assert sale.ventaid == result.venta.ventaid and len(sale.detalles) == 2
+
+    # Un cambio de precio posterior no altera la venta ya hecha
+    with bind.begin() as conn:
+        conn.execute(update(Productos).where(Productos.productoid == alimento).values(precio=Decimal("12.00")))
+    with bind.connect() as conn:
+        assert conn.execute(select(DetalleVenta.preciounitario).where(
+            DetalleVenta.ventaid == result.venta.ventaid, DetalleVenta.productoid == alimento)).scalar() == Decimal("10.50")
+    result, _ = service.checkout(SaleInput(None, (SaleItem(alimento, 1),)))
+    assert result.venta.total == Decimal("12.00") and result.venta.clienteid is None
+
+# Si algún producto no existe o no tiene precio no se escribe nada
+@pytest.mark.parametrize("case, message", [
+    ("missing", "Producto ID no existente"),
+    ("no_price", "sin precio"),
+    ("quantity", "mayor que cero"),
+    ("client", "Cliente ID no existente"),
+])
+def test_checkout_rejects_invalid_sale(bind, clinica, productos, case, message):
+    alimento, _, muestra = productos
+    clienteid = clinica.clienteid
+    items = [SaleItem(alimento, 1)]
+    if case == "missing":
+        items.append(SaleItem(muestra + 100, 1))
+    elif case == "no_price":
+        items.append(SaleItem(muestra, 1))
+    elif case == "quantity":
+        items.append(SaleItem(alimento, 0))
+    else:
+        clienteid += 100
+    with pytest.raises(ValueError, match=message):
+        VeterinariaService(bind).checkout(SaleInput(clienteid, tuple(items)))
+    assert count(bind, Ventas) == 0 and count(bind, DetalleVenta) == 0
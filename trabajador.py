@@ -0,0 +1,96 @@
+import queue
+from concurrent.futures import ThreadPoolExecutor
+
+from configuracion import get_setting
+from instrumentacion import sql_stats
+
+# Hilos dedicados a la base de datos (no conviene que superen el tamaño del pool)
+DB_WORKERS = get_setting("DB_WORKERS", 2, int)
+
+# Ejecuta las consultas en hilos de fondo y entrega los resultados en el hilo de
+# Tk (revisando una cola con root.after), así la ventana nunca se bloquea.
+class DBWorker:
+    def __init__(self, root, workers=DB_WORKERS, poll_ms=30, on_busy=None, on_error=None):
+        self.root = root
+        self.poll_ms = poll_ms
+        self.on_busy = on_busy
+        self.on_error = on_error
+        self.in_flight = 0
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="db")
+        self.results = queue.Queue()
+        self._generations = {}
+        self._futures = {}
+        self._closed = False
+        self.root.after(self.poll_ms, self._poll)
+
+    # Encolar fn(*args). Si se indica "key", un envío posterior con la misma clave
+    # reemplaza al anterior: se cancela si no empezó y su resultado se descarta.
+    # Con las estadísticas de SQL activas, las sentencias de fn se cuentan bajo
+    # "action" (por defecto el nombre de fn, p. ej. list_clients o add_pet).
+    def submit(self, fn, *args, on_done=None, on_error=None, key=None, action=None):
+        # Al cerrar, los resultados que se entregan pueden pedir otra lectura: se ignora
+        if self._closed:
+            return None
+        generation = None
+        if key is not None:
+            generation = self._generations.get(key, 0) + 1
+            self._generations[key] = generation
+            previous = self._futures.pop(key, None)
+            if previous is not None:
+                previous.cancel()
+        if sql_stats.enabled:
+            future = self.executor.submit(sql_stats.run, action or getattr(fn, '__name__', 'consulta'), fn, *args)
+        else:
+            future = self.executor.submit(fn, *args)
+        if key is not None:
+            self._futures[key] = future
+        self.in_flight += 1
+        self._notify_busy()
+        future.add_done_callback(lambda done: self.results.put((key, generation, done, on_done, on_error)))
+        return future
+
+    # Cancelar lo pendiente con esa clave sin encolar nada nuevo
+    def cancel(self, key):
+        self._generations[key] = self._generations.get(key, 0) + 1
+        previous = self._futures.pop(key, None)
+        if previous is not None:
+            previous.cancel()
+
+    # Cerrar el worker. Solo se cancelan las tareas con clave que no empezaron
+    # (páginas de listas, búsquedas, historial: lecturas cuyo resultado ya nadie
+    # va a ver). Las demás, entre ellas todas las altas, bajas y cobros, terminan
+    # antes de liberar los hilos y sus resultados y errores se entregan igual,
+    # así un error al guardar se muestra aunque la ventana se esté cerrando.
+    def shutdown(self):
+        for key in list(self._futures):
+            self.cancel(key)
+        self._closed = True
+        self.executor.shutdown(wait=True)
+        self._poll()
+
+    def _notify_busy(self):
+        if self.on_busy is not None:
+            self.on_busy(self.in_flight)
+
+    def _poll(self):
+        try:
+            while True:
+                key, generation, future, on_done, on_error = self.results.get_nowait()
+                self.in_flight -= 1
+                if key is not None and self._futures.get(key) is future:
+                    del self._futures[key]
+                if future.cancelled() or (key is not None and self._generations.get(key) != generation):
+                    continue
+                error = future.exception()
+                if error is not None:
+                    handler = on_error or self.on_error
+                    if handler is not None:
+                        handler(error)
+                elif on_done is not None:
+                    on_done(future.result())
+        except queue.Empty:
+            pass
+        finally:
+            self._notify_busy()
+            if not self._closed:
+                self.root.after(self.poll_ms, self._poll)
@@ -0,0 +1,118 @@
+from collections import namedtuple
+from datetime import date
+from decimal import Decimal
+
+from sqlalchemy import select, insert, func, literal, bindparam, true, Integer
+from sqlalchemy.dialects.postgresql import ARRAY
+
+from base import Ventas, DetalleVenta, Productos
+from cache_clientes import client_cache
+
+# Función para juntar las líneas del carrito: [(productoid, cantidad), ...] ->
+# {productoid: cantidad}. Un producto repetido suma sus cantidades (la clave de
+# detalleventa es ventaid + productoid).
+def merge_items(items):
+    merged = {}
+    for productoid, cantidad in items:
+        productoid, cantidad = int(productoid), int(cantidad)
+        if cantidad <= 0:
+            raise ValueError("La cantidad debe ser mayor que cero")
+        merged[productoid] = merged.get(productoid, 0) + cantidad
+    if not merged:
+        raise ValueError("La venta no tiene productos")
+    return merged
+
+# Venta registrada: la cabecera y sus líneas
+Venta = namedtuple('Venta', 'ventaid fecha clienteid total')
+Linea = namedtuple('Linea', 'productoid cantidad preciounitario')
+Checkout = namedtuple('Checkout', 'venta lineas')
+
+# Función para cobrar una venta. El total se calcula en la base y el precio
+# unitario de cada línea se copia de productos en ese momento, así un cambio de
+# precio posterior no altera las ventas ya hechas. Cabecera y líneas se escriben
+# en una sola transacción; en PostgreSQL además en un solo viaje a la base.
+def checkout(db, clienteid, items, fecha=None):
+    items = merge_items(items)
+    fecha = fecha or date.today()
+    if clienteid is not None and client_cache.get(db, clienteid) is None:
+        raise ValueError("Cliente ID no existente")
+    if db.get_bind().dialect.name == 'postgresql':
+        result = _checkout_single_statement(db, clienteid, items, fecha)
+    else:
+        result = _checkout_statements(db, clienteid, items, fecha)
+    db.commit()
+    return result
+
+# Precios actuales de los productos del carrito que existen: {productoid: precio}
+def _product_prices(db, items):
+    return dict(db.execute(select(Productos.productoid, Productos.precio).where(Productos.productoid.in_(list(items)))).all())
+
+# Error para un carrito con productos que no existen o no tienen precio
+def _invalid_products_error(items, precios):
+    missing = sorted(set(items) - set(precios))
+    if missing:
+        return ValueError(f"Producto ID no existente: {', '.join(map(str, missing))}")
+    unpriced = sorted(productoid for productoid in items if precios[productoid] is None)
+    return ValueError(f"Producto sin precio: {', '.join(map(str, unpriced))}")
+
+# PostgreSQL: un solo INSERT ... SELECT con CTEs que escriben. Los productos del
+# carrito llegan como dos arreglos (unnest), se cruzan con productos para tomar
+# el precio, se inserta la cabecera con el total y luego todas las líneas, y la
+# consulta final devuelve lo insertado.
+def _checkout_single_statement(db, clienteid, items, fecha):
+    carrito = func.unnest(
+        bindparam('productoids', list(items), type_=ARRAY(Integer)),
+        bindparam('cantidades', list(items.values()), type_=ARRAY(Integer)),
+    ).table_valued('productoid', 'cantidad').render_derived(name='carrito')
+    precios = (
+        select(carrito.c.productoid, carrito.c.cantidad, Productos.precio)
+        .join(Productos, Productos.productoid == carrito.c.productoid)
+        .where(Productos.precio.is_not(None))
+        .cte('precios')
+    )
+    venta = (
+        insert(Ventas)
+        .from_select(['fecha', 'clienteid', 'total'],
+                     select(literal(fecha), literal(clienteid, Integer), func.sum(precios.c.precio * precios.c.cantidad)))
+        .returning(Ventas.ventaid, Ventas.fecha, Ventas.clienteid, Ventas.total)
+        .cte('venta')
+    )
+    lineas = (
+        insert(DetalleVenta)
+        .from_select(['ventaid', 'productoid', 'cantidad', 'preciounitario'],
+                     select(venta.c.ventaid, precios.c.productoid, precios.c.cantidad, precios.c.precio)
+                     .join_from(venta, precios, true()))
+        .returning(DetalleVenta.ventaid, DetalleVenta.productoid, DetalleVenta.cantidad, DetalleVenta.preciounitario)
+        .cte('lineas')
+    )
+    stmt = (
+        select(venta.c.ventaid, venta.c.fecha, venta.c.clienteid, venta.c.total,
+               lineas.c.productoid, lineas.c.cantidad, lineas.c.preciounitario)
+        .join(lineas, lineas.c.ventaid == venta.c.ventaid)
+        .order_by(lineas.c.productoid)
+    )
+    rows = db.execute(stmt).all()
+    if len(rows) != len(items):
+        # Solo para el mensaje: qué productos faltan o no tienen precio
+        db.rollback()
+        raise _invalid_products_error(items, _product_prices(db, items))
+    first = rows[0]
+    venta_row = Venta(first.ventaid, first.fecha, first.clienteid, first.total)
+    return Checkout(venta_row, [Linea(row.productoid, row.cantidad, row.preciounitario) for row in rows])
+
+# Otras bases: precios en una consulta, cabecera con RETURNING y todas las líneas
+# en un solo INSERT de varias filas, dentro de la misma transacción
+def _checkout_statements(db, clienteid, items, fecha):
+    precios = _product_prices(db, items)
+    if len(precios) != len(items) or None in precios.values():
+        db.rollback()
+        raise _invalid_products_error(items, precios)
+    total = sum((Decimal(precios[productoid]) * cantidad for productoid, cantidad in items.items()), Decimal(0))
+    venta = db.execute(
+        insert(Ventas).values(fecha=fecha, clienteid=clienteid, total=total)
+        .returning(Ventas.ventaid, Ventas.fecha, Ventas.clienteid, Ventas.total)
+    ).one()
+    lineas = [dict(ventaid=venta.ventaid, productoid=productoid, cantidad=cantidad, preciounitario=precios[productoid])
+              for productoid, cantidad in sorted(items.items())]
+    db.execute(insert(DetalleVenta).values(lineas))
+    return Checkout(Venta(*venta), [Linea(linea['productoid'], linea['cantidad'], linea['preciounitario']) for linea in lineas])